@@ -12,21 +12,23 @@ Read the source code to get an idea for how it works.
 """
 
 from __future__ import division
+from collections import MutableMapping, OrderedDict
+from functools import partial
+from itertools import chain, count
+from multiprocessing import Pool
 from numbers import Number
 from StringIO import StringIO
-from random import randint
+import os
+import struct
+import zipfile
+import zlib
 
 import numpy as np
-import matplotlib.ticker as mtick
-from scipy.interpolate import griddata
-from scipy.optimize import leastsq, fsolve
-from scipy import stats
-from matplotlib import pyplot as plt, cm
-from matplotlib.ticker import FixedLocator
-from mpldatacursor import datacursor, HighlightingDataCursor  # version 0.5.0
 from pint import UnitRegistry, DimensionalityError
 
-import pydna
+# scipy, pydna and the plotting stack (matplotlib, mpldatacursor 0.5.0) are
+# imported where they are used, on first use, so that the computational core
+# imports quickly and without a display (e.g. in worker processes).
 
 
 
@@ -185,32 +187,139 @@ ver_str = '''
 +------+-----+--------+-------+-----------+-----------+----------+--------+-------+--------+
 '''
 
-# Strings of data as text files
-data_as_file = {'horizontal': StringIO(hor_str\
-                                       .replace('\n|','\n')\
-                                       .replace('|\n','\n')),
-                'vertical':   StringIO(ver_str\
-                                       .replace('\n|','\n')\
-                                       .replace('|\n','\n'))
-                }
-
-# Load data into numpy arrays
-datasets = {}
-for name in data_as_file:
-    datasets[name] = {}
-    data_source = data_as_file[name]
-    temp_dset = np.genfromtxt(data_source, delimiter='|', dtype=None,
-                              skip_header=5, skip_footer=1,
-                              usecols=(0,1,4,5,6),
-                              names=('E','T','muS','muL','gamma'))
-    #for attribute in temp_dset.dtype.names:
-    datasets[name]['E'] = temp_dset['E'] * ureg('V/cm')
-    datasets[name]['T'] = temp_dset['T'] * ureg('(g/(100 mL))*100')
-    datasets[name]['muS'] = temp_dset['muS'] * ureg('1E-8 m**2/(V*s)')
-    datasets[name]['muL'] = temp_dset['muL'] * ureg('1E-8 m**2/(V*s)')
-    datasets[name]['gamma'] = temp_dset['gamma'] * ureg('kbp')
-     
-del hor_str, ver_str, data_as_file, data_source, temp_dset
+# Data tables as text
+dataset_tables = {'horizontal': hor_str, 'vertical': ver_str}
+del hor_str, ver_str
+
+# Compact binary copies of the parsed tables are kept next to the module
+data_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+class LazyDict(MutableMapping):
+    '''
+    Mapping whose values are built on first access by the functions in
+    <loaders> (key: function without arguments) and kept in <data>
+    afterwards, so that every access to a key returns the same object.
+    Keys set directly are stored as they are.
+    '''
+    def __init__(self, loaders):
+        self.loaders = dict(loaders)  # keys not loaded yet
+        self.data = {}                # loaded (or set) values
+
+    def __getitem__(self, key):
+        if key not in self.data:
+            value = self.loaders[key]()
+            del self.loaders[key]
+            self.data[key] = value
+        return self.data[key]
+
+    def __setitem__(self, key, value):
+        self.loaders.pop(key, None)
+        self.data[key] = value
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self.loaders.pop(key, None)
+        self.data.pop(key, None)
+
+    def __contains__(self, key):
+        return key in self.data or key in self.loaders
+
+    def __iter__(self):
+        return chain(list(self.data), list(self.loaders))
+
+    def __len__(self):
+        return len(self.data) + len(self.loaders)
+
+    def __repr__(self):
+        return '<LazyDict %s, loaded: %s>' %(sorted(self), sorted(self.data))
+
+    def clear(self):
+        self.loaders.clear()
+        self.data.clear()
+
+    def copy(self):
+        '''Returns a copy that shares the loaded values and loaders.'''
+        mapping = LazyDict(self.loaders)
+        mapping.data.update(self.data)
+        return mapping
+
+
+def parse_table(table):
+    '''
+    Parses the text <table> of a dataset into a structured array with the
+    fields E, T, muS, muL and gamma.
+    '''
+    source = StringIO(table.replace('\n|','\n').replace('|\n','\n'))
+    return np.genfromtxt(source, delimiter='|', dtype=None,
+                         skip_header=5, skip_footer=1,
+                         usecols=(0,1,4,5,6),
+                         names=('E','T','muS','muL','gamma'))
+
+
+def write_atomic(fname, write, *args):
+    '''
+    Calls <write>(f, *args) with a temporary file <f> next to <fname>,
+    which replaces <fname> only once <write> succeeds and is removed
+    otherwise, so that no partial file is ever left at <fname>.
+    '''
+    temp = '%s.%d.tmp' %(fname, os.getpid())
+    try:
+        with open(temp, 'wb') as f:
+            write(f, *args)
+        if os.name == 'nt' and os.path.exists(fname):
+            os.remove(fname)  # os.rename does not overwrite on Windows
+        os.rename(temp, fname)
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+
+
+def load_table(name):
+    '''
+    Returns the parsed table of dataset <name> (see <parse_table>).
+    The array is read from its binary copy in <data_dir> (named after
+    the checksum of the text, so edited tables are parsed anew) and,
+    when missing, parsed from the text and saved there (skipped if the
+    directory is read-only).
+    '''
+    table = dataset_tables[name]
+    fname = os.path.join(data_dir, 'gel_%s_%08x.npy'
+                         %(name, zlib.crc32(table) & 0xffffffff))
+    try:
+        return np.load(fname)
+    except (IOError, ValueError):
+        data = parse_table(table)
+    try:
+        write_atomic(fname, np.save, data)
+    except (IOError, OSError):
+        pass
+    return data
+
+
+# Fields of a dataset and the units of their values
+dataset_units = OrderedDict([('E', 'V/cm'),
+                             ('T', '(g/(100 mL))*100'),
+                             ('muS', '1E-8 m**2/(V*s)'),
+                             ('muL', '1E-8 m**2/(V*s)'),
+                             ('gamma', 'kbp')])
+
+
+def load_dataset(name):
+    '''
+    Returns built-in dataset <name> as a dictionary of Quantities (see
+    <dataset_units>).
+    '''
+    data = load_table(name)
+    return dict((field, data[field] * ureg(units))
+                for field, units in dataset_units.items())
+
+
+# Load data into numpy arrays (on first access)
+datasets = LazyDict((name, partial(load_dataset, name))
+                    for name in dataset_tables)
 
 # vWBR equation
 def vWBR(muS, muL, gamma):
@@ -219,14 +328,155 @@ def vWBR(muS, muL, gamma):
     beta = 1/muS
     return lambda L: 1/(beta + alpha * (1 - np.exp(-L/gamma)))
 
-# Mobility function: mu(L) = f(muS, muL, gamma)
-mu_funcs = {}
-for name in datasets:
-    mu_funcs[name] = vWBR(datasets[name]['muS'].to('cm**2/V/s'),  # cm^2/(V.sec)
-                          datasets[name]['muL'].to('cm**2/V/s'),  # cm^2/(V.sec)
-                          datasets[name]['gamma'].to('bp')  # bp
-                          )
-del name
+
+def dataset_mu_func(dataset):
+    '''
+    Returns the vWBR mobility function of <dataset> (see <get_dataset>).
+    '''
+    dataset = get_dataset(dataset)
+    return vWBR(dataset['muS'].to('cm**2/V/s'),  # cm^2/(V.sec)
+                dataset['muL'].to('cm**2/V/s'),  # cm^2/(V.sec)
+                dataset['gamma'].to('bp')  # bp
+                )
+
+# Mobility function: mu(L) = f(muS, muL, gamma) (on first access)
+mu_funcs = LazyDict((name, partial(dataset_mu_func, name))
+                    for name in dataset_tables)
+
+
+def get_dataset(dataset=None):
+    '''
+    Returns <dataset>, given as a dictionary or as the name of a registered
+    dataset (see <register_dataset>). Defaults to the 'vertical' dataset.
+    '''
+    if dataset is None:
+        dataset = 'vertical'
+    if isinstance(dataset, basestring):
+        if dataset not in datasets:
+            raise KeyError("Unknown dataset %r (registered: %s)"
+                           %(dataset, ', '.join(sorted(datasets))))
+        return datasets[dataset]
+    return dataset
+
+
+def get_mu_func(dataset=None, mu_func=None):
+    '''
+    Returns <mu_func> or, if None, the mobility function of <dataset> (see
+    <get_dataset>): the registered one for registered datasets, a new vWBR
+    function otherwise.
+    '''
+    if mu_func is not None:
+        return mu_func
+    dataset = get_dataset(dataset)
+    name = dataset_name(dataset)
+    if name is not None:
+        return mu_funcs[name]
+    return dataset_mu_func(dataset)
+
+
+def dataset_name(dataset):
+    '''Returns the name <dataset> is registered with, or None.'''
+    for name, value in datasets.data.items():
+        if value is dataset:
+            return name
+    return None
+
+
+def dataset_checksum(dataset):
+    '''
+    Returns the CRC-32 checksum of the values of <dataset> (see
+    <get_dataset>) in <dataset_units>, e.g. to check the origin of data
+    derived from it.
+    '''
+    crc = 0
+    for values in read_dataset(get_dataset(dataset)).values():
+        crc = zlib.crc32(values.tostring(), crc)
+    return crc & 0xffffffff
+
+
+def read_dataset(source):
+    '''
+    Returns the fields of dataset <source> as a dictionary of float arrays in
+    <dataset_units>. <source> may be:
+    - a dictionary or a structured array with the fields E, T, muS, muL
+      and gamma (Quantities are converted, plain values are taken in
+      <dataset_units>);
+    - an (N, 5) array with the fields as columns, in that order;
+    - the name of a .npy (one of the arrays above), .npz (one array per
+      field) or text file (.csv, comma separated, with a header row naming
+      the fields; other columns are ignored).
+    Raises ValueError if fields are missing, have different lengths or
+    invalid values, or if the (E, T) points are repeated or collinear.
+    '''
+    if isinstance(source, basestring):
+        if source.endswith('.npy') or source.endswith('.npz'):
+            source = np.load(source)
+        else:
+            source = np.genfromtxt(source, delimiter=',', names=True,
+                                   dtype=float)
+    if isinstance(source, np.ndarray) and source.dtype.names is None:
+        source = np.asarray(source, float)
+        if source.ndim != 2 or source.shape[1] != len(dataset_units):
+            raise ValueError("Expected an (N, %d) array with the columns %s, "
+                             "got shape %s" %(len(dataset_units),
+                             ', '.join(dataset_units), source.shape))
+        source = dict(zip(dataset_units, source.T))
+    names = (source.dtype.names if isinstance(source, np.ndarray)
+             else source.keys())
+    missing = [field for field in dataset_units if field not in names]
+    if missing:
+        raise ValueError("Missing dataset fields: %s" %', '.join(missing))
+    data = OrderedDict()
+    for field, units in dataset_units.items():
+        values = source[field]
+        if isinstance(values, Q_):
+            values = (values / ureg(units)).to('dimensionless').magnitude
+        values = np.atleast_1d(np.asarray(values, float))
+        if values.ndim != 1:
+            raise ValueError("Field %s is not one-dimensional" %field)
+        if not np.all(np.isfinite(values)) or np.any(values <= 0):
+            raise ValueError("Field %s has non-finite or non-positive values"
+                             %field)
+        data[field] = values
+    if len(set(len(values) for values in data.values())) != 1:
+        raise ValueError("Dataset fields have different lengths: %s"
+                         %', '.join('%s: %d' %(field, len(values))
+                                    for field, values in data.items()))
+    points = np.column_stack((data['E'], data['T']))
+    if len(set(map(tuple, points))) != len(points):
+        raise ValueError("Dataset has repeated (E, T) points")
+    if len(points) < 3 or np.linalg.matrix_rank(points - points.mean(0)) < 2:
+        raise ValueError("Dataset needs at least 3 non-collinear (E, T) "
+                         "points to be interpolated")
+    return data
+
+
+def register_dataset(name, source, replace=False):
+    '''
+    Reads and validates the dataset <source> (see <read_dataset>) and
+    registers it in <datasets> as <name>, with its vWBR mobility function in
+    <mu_funcs> and its interpolators (see <dataset_interpolators>) built in
+    advance, so that it can be used by name (e.g. <Gel.run(dset_name=name)>,
+    <size_to_mobility(dataset=name)>) like the built-in datasets.
+    An existing dataset is only replaced if <replace>; the results cached for
+    it are discarded. Returns the dataset.
+    '''
+    if name in datasets and not replace:
+        raise ValueError("Dataset %r already exists (use replace=True)" %name)
+    data = read_dataset(source)
+    dataset = dict((field, values * ureg(dataset_units[field]))
+                   for field, values in data.items())
+    if name in datasets:
+        old = datasets.data.get(name)
+        if old is not None:
+            interpolators.pop(id(old), None)
+            mobility_tables.pop(id(old), None)
+        vWBRfit_cache.clear()
+        mu0_cache.clear()
+    datasets[name] = dataset
+    mu_funcs[name] = dataset_mu_func(dataset)
+    dataset_interpolators(dataset)
+    return dataset
 
 # Constants
 kB = ureg.boltzmann_constant.to('m**2 * kg / s**2 / K')  # Boltzmann constant (1.3806488E-23 m^2.kg/(s^2.K))
@@ -236,6 +486,12 @@ b = 0.34 * ureg('nm/bp')  # curvilinear length dsDNA (nm/bp)
 e = ureg.e.to('A*s')  # elementary charge (1.602176565E-19 A.s)
 qeff = e/Q_(7,'bp')  # effective charge per dsDNA base pair (A.s/bp)
 constants = {'kB': kB, 'lp': lp, 'l': l, 'b': b, 'qeff': qeff}
+# Magnitudes in SI units, per base pair (for unit-free computations)
+constants_SI = {'kB': kB.to('m**2*kg/s**2/K').magnitude,
+                'lp': lp.to('m').magnitude,
+                'l': l.to('m').magnitude,
+                'b': b.to('m/bp').magnitude,
+                'qeff': qeff.to('A*s/bp').magnitude}
 
 # mobility = distance/(time*field)
 runtime = lambda distance, mobility, field: distance/(mobility*field)
@@ -283,9 +539,30 @@ Ogston_Zimm = lambda D0, g: D0 * g
 Ogston_Rouse = lambda Nbp, kB, T, a, eta, b, l: kB*T*a**3/(eta*b**2*l**2*Nbp**2)
 
 # Diffusion regime frontiers (in number of occupied pores)
-Zimm_Rouse = lambda x0, args: (
-    Nbp_to_N(fsolve(diff_Zimm_Rouse, x0, args)[0] * ureg.bp,
-             args[5], args[6], args[7]))
+def Zimm_Rouse(x0, args, Nbp_lims=(1E-3, 1E15)):
+    '''
+    Ogston-Zimm to Rouse frontier: root of DZimm - DRouse (see
+    <diff_Zimm_Rouse>), with unit-free <args> (SI units, per bp).
+    As DZimm/DRouse = D0*Nbp*qeff/(mu0*kB*T), the root is bracketed in
+    log(Nbp) starting from <x0> (bp) and solved by Brent's method.
+    '''
+    kB, T, qeff, eta, mu0, a, b, l, lp = args
+    def excess(logNbp):  # DZimm/DRouse - 1
+        Nbp = np.exp(logNbp)
+        Rg = radius_gyration(contour_length(Nbp, b), lp)
+        return free_solution(kB, T, eta, Rg)*Nbp*qeff/(mu0*kB*T) - 1
+    lo = hi = np.log(x0)
+    while excess(lo) > 0 and lo > np.log(Nbp_lims[0]):
+        lo -= np.log(10)
+    while excess(hi) < 0 and hi < np.log(Nbp_lims[1]):
+        hi += np.log(10)
+    if excess(lo) > 0 or excess(hi) < 0:
+        print "WARNING: no Zimm-Rouse frontier between %g and %g bp." %Nbp_lims
+        return np.nan
+    from scipy.optimize import brentq
+    Nbp = np.exp(brentq(excess, lo, hi, xtol=1E-12)) if lo < hi else x0
+    return Nbp_to_N(Nbp, a, b, l)
+
 equil_accel = lambda epsilon: epsilon**(-2/3)
 accel_plateau = lambda epsilon: epsilon**(-1)
 
@@ -320,54 +597,176 @@ def diff_Zimm_Rouse(Nbp, args):
     return DZimm - DRouse
 
 # Diffusion coefficient
-def diffusion_coefficient(Nbp, N_lim1, N_lim2, N_lim3, args):
+def diffusion_coefficient(Nbp, N_lim1, N_lim2, N_lim3, args, E):
+    '''
+    Diffusion coefficients of DNA fragments of sizes <Nbp> (array, bp)
+    in the field <E>, given the regime frontiers <N_lim1>, <N_lim2> and
+    <N_lim3> (see <regime_frontiers>). Unit-free: <args> and <E> in SI
+    units (per bp), as in <diff_Zimm_Rouse>; D in m^2/s.
+    Each regime is only evaluated for the fragments it applies to.
+    '''
     kB, T, qeff, eta, mu0, a, b, l, lp = args
+    Nbp = np.asarray(Nbp, float)
     N = Nbp_to_N(Nbp, a, b, l)
-    if N < N_lim3:
-        # Ogston-Zimm
-        L = contour_length(Nbp, b)
-        Rg = radius_gyration(L, lp)
-        D0 = free_solution(kB, T, eta, Rg)
-        DRouse = Ogston_Rouse(Nbp, kB, T, a, eta, b, l)
-        g = Zimm_g(Nbp, DRouse, qeff, mu0, kB, T)
-        D = Ogston_Zimm(D0, g)
-    elif N < N_lim2:
-        # Rouse/Reptation-equilibrium
-        D = Db/N**2
-    elif N > N_lim1:
-        # Reptation-plateau (reptation with orientation)
-        D = Db*epsilon**(3/2)
-    else:
-        # Accelerated-reptation
-        D = Db*epsilon*N**(-1/2)
+    Db = Dblob(kB, T, eta, a)
+    epsilon = reduced_field(eta, a, mu0, E, kB, T)
+    zimm = N < N_lim3
+    rouse = ~zimm & (N < N_lim2)
+    plateau = ~zimm & ~rouse & (N > N_lim1)
+    accel = ~(zimm | rouse | plateau)
+    D = np.empty_like(N)
+    # Ogston-Zimm
+    L = contour_length(Nbp[zimm], b)
+    Rg = radius_gyration(L, lp)
+    D0 = free_solution(kB, T, eta, Rg)
+    DRouse = Ogston_Rouse(Nbp[zimm], kB, T, a, eta, b, l)
+    g = Zimm_g(Nbp[zimm], DRouse, qeff, mu0, kB, T)
+    D[zimm] = Ogston_Zimm(D0, g)
+    # Rouse/Reptation-equilibrium
+    D[rouse] = reptation_equilibrium(Db, N[rouse])
+    # Reptation-plateau (reptation with orientation)
+    D[plateau] = reptation_plateau(Db, epsilon)
+    # Accelerated-reptation
+    D[accel] = reptation_accelerated(Db, epsilon, N[accel])
     return D
 
-def rand_str(sample, length):
-    rnd_str = ''
-    for i in xrange(length):
-        r = randint(0, len(sample)-1)
-        rnd_str += sample[r]
-    return rnd_str
-
-def randDNAseqs(sizes):
-    ladder = []
-    for size in sizes:
-        seq = pydna.Dseq(rand_str('actg', size))
-        ladder.append(seq)
-    return ladder
-
-def gen_ladder(sizes, quantities, vol=Q_(12,'ul')):
-    frags = randDNAseqs(to_units(sizes, 'bp').magnitude)
+def random_generator(seed=None):
+    '''
+    NumPy random generator seeded with <seed> (a np.random.Generator if
+    available, a RandomState otherwise). Generators are returned as given.
+    '''
+    if hasattr(seed, 'integers') or hasattr(seed, 'randint'):
+        return seed
+    if hasattr(np.random, 'default_rng'):
+        return np.random.default_rng(seed)
+    return np.random.RandomState(seed)
+
+def random_sequences(sizes, seed=None, alphabet='actg'):
+    '''
+    Returns random sequences (strings) of the given <sizes>, over the
+    characters of <alphabet>. All of them are drawn at once, as bytes, from
+    a NumPy random generator (see <random_generator>), so equal <seed>s
+    give equal sequences.
+    '''
+    rng = random_generator(seed)
+    draw = rng.integers if hasattr(rng, 'integers') else rng.randint
+    sizes = np.asarray(sizes, dtype=int)
+    letters = np.frombuffer(''.join(alphabet), dtype=np.uint8)
+    data = letters[draw(0, len(letters), sizes.sum())].tostring()
+    bounds = np.cumsum(np.append(0, sizes))
+    return [data[bounds[i]:bounds[i+1]] for i in xrange(len(sizes))]
+
+def rand_str(sample, length, seed=None):
+    return random_sequences([length], seed, sample)[0]
+
+def random_dseq(size, seed=None):
+    '''Random pydna.Dseq of <size> bp (see <random_sequences>).'''
+    import pydna
+    return pydna.Dseq(random_sequences([size], seed)[0])
+
+def randDNAseqs(sizes, seed=None):
+    import pydna
+    return [pydna.Dseq(seq) for seq in random_sequences(sizes, seed)]
+
+class Fragment(object):
+    '''
+    Lightweight DNA fragment that only stores its <size> (bp), an optional
+    <label> and an optional <seq>, which may be given as a function to
+    be called (once) on first access. Enough for <Sample> and <Gel>, that
+    only need the sizes of the fragments.
+    Fragments with a label are equal if their sizes and labels are;
+    unlabelled fragments are only equal to themselves and their copies
+    (pickled or copied fragments keep their <token>).
+    '''
+    __slots__ = ('size', 'label', '_seq', 'token')
+
+    # Tokens of the unlabelled fragments: random prefix of this session,
+    # process id and counter, unique across processes and sessions
+    _prefix = struct.unpack('<Q', os.urandom(8))[0]
+    _count = count()
+
+    def __init__(self, size, label=None, seq=None):
+        self.size = int(size)
+        self.label = label
+        self._seq = seq
+        self.token = (Fragment._prefix, os.getpid(), next(Fragment._count))
+
+    def __repr__(self):
+        if self.label is None:
+            return "Fragment(%d bp)" %self.size
+        return "Fragment(%d bp, %r)" %(self.size, self.label)
+
+    def __len__(self):
+        return self.size
+
+    def __eq__(self, other):
+        return (isinstance(other, Fragment) and
+                self.fingerprint() == other.fingerprint())
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.fingerprint())
+
+    def __getstate__(self):
+        return self.size, self.label, self._seq, self.token
+
+    def __setstate__(self, state):
+        self.size, self.label, self._seq, self.token = state
+
+    def fingerprint(self):
+        '''Hashable identity of the fragment (see <solute_key>).'''
+        if self.label is None:
+            return ('fragment', self.token)
+        return ('fragment', self.size, self.label)
+
+    @property
+    def seq(self):
+        '''Sequence of the fragment (None if not given).'''
+        if callable(self._seq):
+            self._seq = self._seq()
+        return self._seq
+
+
+def fragments(sizes, labels=None, seed=None):
+    '''
+    Returns size-only <Fragment>s of the given <sizes> (bp). If a <seed>
+    (int) is given, each fragment gets a lazy, reproducible random sequence
+    (see <random_dseq>).
+    '''
+    labels = labels if labels is not None else [None]*len(sizes)
+    seqs = ([partial(random_dseq, size, [seed, i])
+             for i, size in enumerate(sizes)] if seed is not None
+            else [None]*len(sizes))
+    return [Fragment(size, label, seq)
+            for size, label, seq in zip(sizes, labels, seqs)]
+
+def gen_ladder(sizes, quantities, vol=Q_(12,'ul'), seed=None):
+    frags = fragments(to_units(sizes, 'bp').magnitude, seed=seed)
     return Sample(frags, quantities, vol)
 
-def ladder_from_info(key, qty=Q_(500,'ng'), vol=Q_(12,'ul')):
+# Ladder templates: (key, qty, vol, seed): Sample
+ladder_templates = {}
+
+def ladder_from_info(key, qty=Q_(500,'ng'), vol=Q_(12,'ul'), seed=None):
+    '''
+    Returns the ladder <key> (see <ladders>) with a total quantity <qty>
+    in the volume <vol>. Each ladder is built once and its copies share
+    its data until they are modified (see <Sample.share>).
+    '''
     assert key in ladders, "Key not recognized. Choose from: %s" %ladders.keys()
     qty = to_units(qty, Vars['quantities']['units'], var_name='qty')
     vol = to_units(vol, Vars['volume']['units'], var_name='vol')
-    sizes = ladders[key]['sizes']
-    fracs = ladders[key]['percent']
-    quantities = qty*fracs
-    return gen_ladder(sizes, quantities, vol)
+    template_key = (key, magnitudes_key(qty, 'ng'), magnitudes_key(vol, 'ul'),
+                    seed)
+    if template_key not in ladder_templates:
+        sizes = ladders[key]['sizes']
+        fracs = ladders[key]['percent']
+        quantities = qty*fracs
+        ladder_templates[template_key] = gen_ladder(sizes, quantities, vol,
+                                                    seed)
+    return ladder_templates[template_key].share()
 
 def logspace_int(minimum, maximum, divs):
     space = np.logspace(np.log10(minimum), np.log10(maximum), divs)
@@ -384,6 +783,49 @@ def flatten(List):
             flatL.append(elem)
     return flatL
 
+class LRUCache:
+    '''
+    Dictionary-like cache that keeps up to <maxsize> items, discarding the
+    least recently used ones.
+    '''
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+
+    def __repr__(self):
+        return "<LRU cache: %d/%d items>" %(len(self.data), self.maxsize)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __getitem__(self, key):
+        value = self.data.pop(key)
+        self.data[key] = value
+        return value
+
+    def __setitem__(self, key, value):
+        self.data.pop(key, None)
+        self.data[key] = value
+        if len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def clear(self):
+        self.data.clear()
+
+
+def magnitudes_key(quantity, units):
+    """
+    Returns a hashable key (tuple of floats) with the magnitude(s) of
+    <quantity> in <units>, to be used in cache keys.
+    """
+    quantity = to_units(quantity, units)
+    return tuple(np.atleast_1d(quantity.magnitude).astype(float).ravel())
+
+
 # Gaussian function
 Gaussian = lambda x, hgt, ctr, dev: hgt*np.exp(-(x-ctr)**2/(2*dev**2))
 Gauss_hgt = lambda auc, dev: auc/(dev*np.sqrt(2*np.pi))
@@ -438,6 +880,17 @@ def dim_or_units(quantity, reference):
     return quantity
 
 
+def lane_values(quantity, units, nlanes):
+    """
+    Returns the magnitudes of <quantity> in <units> as a float array with
+    one value per lane (a single value is repeated for every lane).
+    """
+    values = np.asarray(to_units(quantity, units).magnitude, float)
+    if values.ndim == 0:
+        values = np.repeat(values, nlanes)
+    return values
+
+
 def assign_quantities(samples, quantities, maxdef=Q_(150,'ng')):
     '''
     Assigns quantities (masses in nanograms) to the DNA fragments without
@@ -523,7 +976,7 @@ def assign_quantitiesB(samples, maxdef=Q_(150,'ng')):
         if quantities[i] == []:
             # Linearly extrapolates each DNA fragment's quantity taking as
             # reference the maximum quantity registered (or the default)
-            sizes = [len(dna) for dna in sample.solutes]
+            sizes = sample.sizes
             maxL = max(sizes)
             quantities[i] = [size*maxQ/maxL for size in sizes]
     quantities = to_units(quantities, units, 'quantities')
@@ -540,48 +993,382 @@ def lindivQ(sample, quantity, criteria=len):
     return [size*quantity/sum(sizes) for size in sizes]
 
 
+# Interpolation structures (built once per dataset)
+interpolators = {}
+
+def dataset_interpolators(dataset):
+    """
+    Returns the Delaunay triangulation and the nearest-neighbour tree of the
+    (E, T) points of <dataset>. Both are built on first use and cached, so
+    that 'linear', 'cubic' and 'nearest' interpolations over that dataset
+    never re-triangulate the data.
+    """
+    from scipy.spatial import Delaunay, cKDTree
+    key = id(dataset)
+    if key not in interpolators or interpolators[key][0] is not dataset:
+        points = np.column_stack((np.asarray(dataset['E'].magnitude, float),
+                                  np.asarray(dataset['T'].magnitude, float)))
+        interpolators[key] = (dataset, Delaunay(points), cKDTree(points))
+    return interpolators[key][1:]
+
+
+def _ET_points(fields, percentages, Eunits='V/cm',
+               Tunits='(g/(100 mL))*100'):
+    """
+    Returns the (E, T) magnitudes of one or more conditions, in the units
+    <Eunits> and <Tunits>, as an array of shape (M, 2). A single field
+    (or percentage) is broadcast against several percentages (or fields).
+    """
+    if isinstance(fields, Q_) or not isinstance(fields, Number):
+        fields = to_units(fields, Eunits, 'fields').magnitude
+    if isinstance(percentages, Q_) or not isinstance(percentages, Number):
+        percentages = to_units(percentages, Tunits, 'percentages').magnitude
+    fields, percentages = np.broadcast_arrays(np.atleast_1d(fields),
+                                              np.atleast_1d(percentages))
+    return np.column_stack((fields, percentages)).astype(float)
+
+
+def interpolate_ET(values, xi, dataset, method='linear'):
+    """
+    Interpolates <values> (given at the (E, T) points of <dataset>) at the
+    points <xi> using the cached interpolation structures of <dataset>.
+    Equivalent to <scipy.interpolate.griddata> with the same <method>.
+    """
+    from scipy.interpolate import (LinearNDInterpolator,
+                                   CloughTocher2DInterpolator)
+    tri, tree = dataset_interpolators(dataset)
+    if method == 'nearest':
+        return values[tree.query(xi)[1]]
+    elif method == 'linear':
+        return LinearNDInterpolator(tri, values)(xi)
+    elif method == 'cubic':
+        return CloughTocher2DInterpolator(tri, values)(xi)
+    else:
+        raise ValueError("Unknown interpolation method %r" %method)
+
+
+def sizes_to_mobilities(dna_lens, fields, percentages,
+                        mu_func = None,
+                        dataset = None,
+                        method = 'linear',
+                        replNANs = True):
+    """
+    Vectorized version of <size_to_mobility>. Returns the (N, M) array of
+    mobilities (cm^2/(V.sec)) of N DNA sizes (<dna_lens>, bp) at M (E, %T)
+    conditions (<fields>, <percentages>) in a single interpolation pass.
+    NANs (conditions outside the data's convex hull) are replaced, if
+    <replNANs>, by 'nearest' interpolation.
+    With method='table' the mobilities are read from the lookup table loaded
+    for <dataset> (see <load_mobility_table>); outside its grid they are
+    NANs, replaced, if <replNANs>, by 'linear' interpolation.
+    <dataset> may be given by name and defaults to 'vertical' (see
+    <get_dataset>); <mu_func> defaults to its mobility function.
+    """
+    mu_func = get_mu_func(dataset, mu_func)
+    dataset = get_dataset(dataset)
+    if method == 'table':
+        # Precomputed lookup table (see <build_mobility_table>)
+        mobilities = mobility_table(dataset).mobilities(dna_lens, fields,
+                                                        percentages)
+        nans = np.isnan(mobilities)
+        if replNANs and nans.any():
+            # Replace NANs (outside the table's grid) by 'linear'
+            # interpolation of the dataset
+            linear = sizes_to_mobilities(dna_lens, fields, percentages,
+                                         mu_func, dataset, 'linear', True)
+            mobilities[nans] = linear[nans]
+        return mobilities
+    dna_lens = to_units(dna_lens, 'bp', 'dna_lens')
+    dna_lens = Q_(np.atleast_1d(dna_lens.magnitude), dna_lens.units)
+    xi = _ET_points(fields, percentages, dataset['E'].units,
+                    dataset['T'].units)
+    mu = mu_func(dna_lens[:, np.newaxis])  # (N sizes, P dataset points)
+    mu = np.asarray(mu.magnitude if isinstance(mu, Q_) else mu, float).T
+    mobilities = interpolate_ET(mu, xi, dataset, method).T
+    nans = np.isnan(mobilities)
+    if replNANs and nans.any():
+        # Replace NANs by 'nearest' interpolation
+        print ("WARNING: %d NAN(s) replaced by 'nearest' interpolation."
+               %nans.sum())  ############################################ ! ###
+        nearest = interpolate_ET(mu, xi, dataset, 'nearest').T
+        mobilities[nans] = nearest[nans]
+    return mobilities
+
+
 def size_to_mobility(dna_len, field, percentage,
-                     mu_func = mu_funcs['vertical'],
-                     dataset = datasets['vertical'],
+                     mu_func = None,
+                     dataset = None,
                      method = 'linear',
                      replNANs = True):
     """
     At some point this will have a description...
     """
-    mobility = griddata((dataset['E'], dataset['T']), mu_func(dna_len),
-                        (field, percentage), method)
-    if replNANs and np.isnan(mobility):
-        # Replace NANs by 'nearest' interpolation
-        print "WARNING: NAN replaced by 'nearest' interpolation." ####### ! ###
-        mobility = griddata((dataset['E'], dataset['T']), mu_func(dna_len),
-                            (field, percentage), method='nearest')
+    mobility = sizes_to_mobilities(dna_len, field, percentage, mu_func,
+                                   dataset, method, replNANs)
     return mobility.item()
 
 
 
+def condition_weights(field, percentage,
+                      dataset = None,
+                      method = 'linear',
+                      replNANs = True):
+    """
+    Returns the indices of the (E, T) points of <dataset> that enclose the
+    condition (<field>, <percentage>) and their interpolation weights:
+    the vertices of the enclosing simplex and their barycentric coordinates
+    ('linear') or the closest point with weight 1 ('nearest'). Outside the
+    convex hull of the data the 'nearest' point is used if <replNANs>.
+    """
+    dataset = get_dataset(dataset)
+    xi = _ET_points(field, percentage, dataset['E'].units, dataset['T'].units)
+    tri, tree = dataset_interpolators(dataset)
+    if method == 'linear':
+        simplex = tri.find_simplex(xi)[0]
+        if simplex >= 0:
+            transform = tri.transform[simplex]
+            bary = transform[:tri.ndim].dot(xi[0] - transform[tri.ndim])
+            return tri.simplices[simplex], np.append(bary, 1 - bary.sum())
+        if not replNANs:
+            return np.array([0]), np.array([np.nan])
+        print "WARNING: NAN replaced by 'nearest' interpolation." ####### ! ###
+    elif method != 'nearest':
+        raise ValueError("No fixed-condition weights for method %r" %method)
+    return tree.query(xi)[1], np.array([1.0])
+
+
+def condition_mu_func(field, percentage,
+                      dataset = None,
+                      method = 'linear',
+                      replNANs = True):
+    """
+    Returns the mobility function mu(L) (cm^2/(V.sec)) of <dataset> at the
+    fixed condition (<field>, <percentage>). The enclosing simplex and its
+    weights are found once (see <condition_weights>), so that each call
+    only evaluates the vWBR curves of its vertices for all the DNA sizes
+    at once. Same results as <sizes_to_mobilities> with <dataset>'s vWBR
+    mobility function.
+    """
+    dataset = get_dataset(dataset)
+    idx, weights = condition_weights(field, percentage, dataset, method,
+                                     replNANs)
+    muS = dataset['muS'].to('cm**2/V/s').magnitude[idx]
+    muL = dataset['muL'].to('cm**2/V/s').magnitude[idx]
+    gamma = dataset['gamma'].to('bp').magnitude[idx]
+    alpha = 1/muL - 1/muS
+    beta = 1/muS
+    def mu_func(dna_lens):
+        L = to_units(dna_lens, 'bp', 'dna_lens').magnitude
+        L = np.atleast_1d(L).astype(float)[:, np.newaxis]
+        return (1/(beta + alpha * (1 - np.exp(-L/gamma)))).dot(weights)
+    return mu_func
+
+
+
+class MobilityTable:
+    '''
+    Mobilities (cm^2/(V.sec)) of a dataset sampled on a regular
+    E x %T x ln(L) grid and queried by trilinear interpolation.
+    Queries outside the grid are NANs.
+    The table may be a read-only memory map shared by several processes
+    (see <build_mobility_table> and <load_mobility_table>).
+    <source> is the (name, checksum) of the dataset it was built from
+    (see <dataset_checksum>).
+    '''
+
+    def __init__(self, table, lims, source=(None, None)):
+        self.table = table  # (nE, nT, nL) array
+        self.lims = np.asarray(lims, float)  # [[Emin, Emax], [Tmin, Tmax], [lnLmin, lnLmax]]
+        self.source = source
+
+    def __repr__(self):
+        return ("<mobility table: %dx%dx%d (E=%s-%s V/cm, %%T=%s-%s, "
+                "L=%d-%d bp)>" %(self.table.shape + tuple(self.lims[:2].ravel())
+                                 + tuple(np.exp(self.lims[2]).round())))
+
+    def _index(self, vals, axis):
+        """
+        Returns lower grid indices and weights of <vals> along <axis>, and
+        whether they are outside the grid.
+        """
+        n = self.table.shape[axis]
+        lo, hi = self.lims[axis]
+        pos = (vals - lo) / (hi - lo) * (n - 1)
+        outside = (pos < -1E-9) | (pos > n - 1 + 1E-9)
+        pos = np.clip(pos, 0, n - 1)
+        idx = np.minimum(pos.astype(int), n - 2)
+        return idx, pos - idx, outside
+
+    def mobilities(self, dna_lens, fields, percentages):
+        """
+        Returns the (N, M) array of mobilities (cm^2/(V.sec)) of N DNA sizes
+        (bp) at M (E, %T) conditions (same interface as
+        <sizes_to_mobilities>), NANs outside the grid.
+        """
+        lnL = np.log(np.atleast_1d(to_units(dna_lens, 'bp', 'dna_lens').magnitude))
+        xi = _ET_points(fields, percentages)
+        iE, wE, outE = self._index(xi[:, 0], 0)
+        iT, wT, outT = self._index(xi[:, 1], 1)
+        iL, wL, outL = self._index(lnL.astype(float), 2)
+        iE, wE, iT, wT = iE[np.newaxis], wE[np.newaxis], iT[np.newaxis], wT[np.newaxis]
+        iL, wL = iL[:, np.newaxis], wL[:, np.newaxis]
+        mobilities = np.zeros((len(lnL), len(xi)))
+        for a, fE in ((0, 1-wE), (1, wE)):
+            for b, fT in ((0, 1-wT), (1, wT)):
+                for c, fL in ((0, 1-wL), (1, wL)):
+                    mobilities += fE*fT*fL * self.table[iE+a, iT+b, iL+c]
+        mobilities[outL[:, np.newaxis] | (outE | outT)[np.newaxis]] = np.nan
+        return mobilities
+
+    def save(self, fname):
+        """
+        Saves the table to <fname> (.npy, memory-mappable) and its grid
+        limits and <source> to the .npz file with the same base name.
+        """
+        base = fname[:-4] if fname.endswith('.npy') else fname
+        name, crc = self.source
+        np.save(base + '.npy', np.asarray(self.table))
+        np.savez(base + '.npz', lims=self.lims,
+                 dataset=name if name is not None else '',
+                 crc=crc if crc is not None else -1)
+
+
+# Lookup tables loaded for each dataset (method='table')
+mobility_tables = {}
+
+def mobility_table(dataset):
+    """Returns the lookup table loaded for <dataset>."""
+    key = id(dataset)
+    if key not in mobility_tables or mobility_tables[key][0] is not dataset:
+        raise KeyError("No mobility table loaded for this dataset. "
+                       "See <build_mobility_table> and <load_mobility_table>.")
+    return mobility_tables[key][1]
+
+
+def build_mobility_table(dataset = None,
+                         mu_func = None,
+                         fname = None,
+                         divs = (64, 64, 256),
+                         Llims = Q_([50, 200000], 'bp'),
+                         method = 'linear'):
+    """
+    Samples <sizes_to_mobilities> on a regular E x %T x ln(L) grid with
+    <divs> points per axis, spanning the range of the (E, T) points of
+    <dataset> and the DNA sizes in <Llims>. NANs are replaced by 'nearest'
+    interpolation, so that the whole grid is defined.
+    If <fname> is given, the table is saved to disk (see <MobilityTable.save>).
+    Returns the <MobilityTable>.
+    """
+    mu_func = get_mu_func(dataset, mu_func)
+    dataset = get_dataset(dataset)
+    nE, nT, nL = divs
+    Evals = np.asarray(dataset['E'].magnitude, float)
+    Tvals = np.asarray(dataset['T'].magnitude, float)
+    lnLlims = np.log(to_units(Llims, 'bp', 'Llims').magnitude)
+    lims = [[Evals.min(), Evals.max()], [Tvals.min(), Tvals.max()], lnLlims]
+    E_space = np.linspace(lims[0][0], lims[0][1], nE)
+    T_space = np.linspace(lims[1][0], lims[1][1], nT)
+    L_space = np.exp(np.linspace(lnLlims[0], lnLlims[1], nL))
+    EE, TT = np.meshgrid(E_space, T_space, indexing='ij')
+    mobs = sizes_to_mobilities(L_space, EE.ravel(), TT.ravel(), mu_func,
+                               dataset, method, replNANs=False)
+    nans = np.isnan(mobs)
+    if nans.any():
+        nearest = sizes_to_mobilities(L_space, EE.ravel(), TT.ravel(),
+                                      mu_func, dataset, 'nearest', False)
+        mobs[nans] = nearest[nans]
+    table = MobilityTable(mobs.T.reshape(nE, nT, nL), lims,
+                          (dataset_name(dataset), dataset_checksum(dataset)))
+    if fname is not None:
+        table.save(fname)
+    return table
+
+
+def load_mobility_table(fname, dataset = None, mmap = True):
+    """
+    Loads a table saved by <build_mobility_table> (memory-mapped read-only
+    if <mmap>) and registers it for <dataset>, so that method='table'
+    (e.g. <Gel.run(interpol='table')>) reads mobilities from it.
+    Raises ValueError if the table was built from a different dataset (see
+    <dataset_checksum>).
+    Returns the <MobilityTable>.
+    """
+    dataset = get_dataset(dataset)
+    base = fname[:-4] if fname.endswith('.npy') else fname
+    table = np.load(base + '.npy', mmap_mode='r' if mmap else None)
+    info = np.load(base + '.npz')
+    crc = dataset_checksum(dataset)
+    if 'crc' not in info.files or int(info['crc']) < 0:
+        print ("WARNING: the dataset of mobility table %r is unknown."
+               %fname)  ############################################### ! ###
+    elif int(info['crc']) != crc:
+        raise ValueError("Mobility table %r was built from dataset %r "
+                         "(checksum %08x), not from %r (checksum %08x)."
+                         %(fname, str(info['dataset']) or None,
+                           int(info['crc']), dataset_name(dataset), crc))
+    mob_table = MobilityTable(table, info['lims'],
+                              (dataset_name(dataset), crc))
+    mobility_tables[id(dataset)] = (dataset, mob_table)
+    return mob_table
+
+
+
+# Cache of vWBR fits (see <vWBRfit>)
+vWBRfit_cache = LRUCache(256)
+
+def vWBR_jacobian(pars, L, mu):
+    """Jacobian of the residuals (mu - vWBR(L)) with respect to (muS, muL, gamma)."""
+    muS, muL, gamma = pars
+    e = np.exp(-L/gamma)
+    mu_fit2 = (e/muS + (1-e)/muL)**-2
+    return np.column_stack((-mu_fit2 * e/muS**2,
+                            -mu_fit2 * (1-e)/muL**2,
+                            mu_fit2 * (1/muS - 1/muL) * e*L/gamma**2))
+
+
 def vWBRfit(field, percentage, DNAvals=np.linspace(100,50000,100),
-            dataset = datasets['vertical'], mu_func = mu_funcs['vertical'],
+            dataset = None, mu_func = None,
             method = 'linear', replNANs = True, plot=True):
     """
     At some point this will have a description...
+    Fits are memoized on (field, percentage, dataset, method, DNAvals).
+    The cache entries keep <dataset> and <mu_func>, so that their ids are
+    not reused by other objects while cached.
     """
-    mu = np.zeros(len(DNAvals))
+    mu_func = get_mu_func(dataset, mu_func)
+    dataset = get_dataset(dataset)
     vWBR = lambda L, muS, muL, gamma: (1/muS+(1/muL-1/muS)*(1-np.exp(-L/gamma)))**-1
-    for i, Li in enumerate(DNAvals):
-        mu[i] = size_to_mobility(Li, field, percentage, mu_func,
-                                 dataset, method, replNANs)
-    def residuals(pars, L, mu):
-        return mu - vWBR(L, *pars)
-    muS0 = 3.5E-4  # cm^2/(V.sec)  ############################################
-    muL0 = 1.0E-4  # cm^2/(V.sec)  ############################################
-    gamma0 = 8000  # bp            ############################################
-    pars, cov, infodict, mesg, ier = leastsq(residuals, [muS0,muL0,gamma0],
-                                             args=(DNAvals, mu),
-                                             full_output=True)
+    key = (magnitudes_key(field, 'V/cm'),
+           magnitudes_key(percentage, '(g/(100 mL))*100'),
+           id(dataset), id(mu_func), method, replNANs,
+           magnitudes_key(DNAvals, 'bp'))
+    mu = None
+    cached = vWBRfit_cache[key] if key in vWBRfit_cache else None
+    if cached is None or cached[0] is not dataset or cached[1] is not mu_func:
+        from scipy.optimize import leastsq
+        L = to_units(DNAvals, 'bp', 'DNAvals').magnitude.astype(float)
+        mu = sizes_to_mobilities(L, field, percentage, mu_func,
+                                 dataset, method, replNANs)[:, 0]
+        def residuals(pars, L, mu):
+            return mu - vWBR(L, *pars)
+        muS0 = 3.5E-4  # cm^2/(V.sec)  ########################################
+        muL0 = 1.0E-4  # cm^2/(V.sec)  ########################################
+        gamma0 = 8000  # bp            ########################################
+        cached = vWBRfit_cache[key] = (dataset, mu_func,
+                                       leastsq(residuals, [muS0,muL0,gamma0],
+                                               args=(L, mu),
+                                               Dfun=vWBR_jacobian,
+                                               full_output=True))
+    pars, cov, infodict, mesg, ier = cached[2]
     muS, muL, gamma = pars
     #print ('E=%.2f V/cm, T=%.1f %%, muS=%.3e, muL=%.3e cm^2/(V.s), gamma=%s bp'
     #       %(field, percentage, muS, muL, gamma))
     if plot:
+        import matplotlib.ticker as mtick
+        from matplotlib import pyplot as plt
+        if mu is None:
+            mu = sizes_to_mobilities(DNAvals, field, percentage, mu_func,
+                                     dataset, method, replNANs)[:, 0]
         DNAmin = min(DNAvals)
         DNAmax = max(DNAvals)
         fig = plt.figure()
@@ -605,6 +1392,30 @@ def vWBRfit(field, percentage, DNAvals=np.linspace(100,50000,100),
 
 
 
+# Cache of free solution mobilities (see <ferguson_to_mu0>)
+mu0_cache = LRUCache(256)
+
+def ferguson_regressions(Tvals, ln_mu_LxT):
+    """
+    Least squares lines (ln(mu) vs. %T) of every row of <ln_mu_LxT>,
+    solved at once ignoring NANs. Returns the gradients and intercepts of
+    the rows with enough (> 1) points and the boolean mask of those rows.
+    """
+    valid = ~np.isnan(ln_mu_LxT)
+    npts = valid.sum(axis=1)
+    fit = npts > 1  #(enough points for linear regression)
+    w = valid[fit].astype(float)
+    y = np.where(valid[fit], ln_mu_LxT[fit], 0)
+    x = np.asarray(Tvals, float)[np.newaxis, :]
+    n = npts[fit]
+    x_mean = (w*x).sum(axis=1)/n
+    y_mean = (w*y).sum(axis=1)/n
+    dx = (x - x_mean[:, np.newaxis])*w
+    gradients = (dx*(y - y_mean[:, np.newaxis])).sum(axis=1)/(dx**2).sum(axis=1)
+    intercepts = y_mean - gradients*x_mean
+    return gradients, intercepts, fit
+
+
 def ferguson_to_mu0(field, Tvals, DNAvals, dataset, mu_func,
                     adjmethod='linear', replNANs=True, plot=True):
     '''
@@ -614,40 +1425,38 @@ def ferguson_to_mu0(field, Tvals, DNAvals, dataset, mu_func,
 
     Mobiliy calculation method:
     [E,T,muS,muL,gamma] -> [E,T,mu(L)] -(L*)-> [E,T,mu] -(E*,T*,interp.)-> mu*
+
+    Results are memoized on (field, Tvals, DNAvals, dataset, adjmethod).
+    The cache entries keep <dataset> and <mu_func>, so that their ids are
+    not reused by other objects while cached.
     '''
+    key = (magnitudes_key(field, 'V/cm'),
+           magnitudes_key(Tvals, '(g/(100 mL))*100'),
+           magnitudes_key(DNAvals, 'bp'),
+           id(dataset), id(mu_func), adjmethod, replNANs)
+    if key in mu0_cache and not plot:
+        cached = mu0_cache[key]
+        if cached[0] is dataset and cached[1] is mu_func:
+            return cached[2]
+    Tvals = to_units(Tvals, '(g/(100 mL))*100', 'Tvals').magnitude
+    Tvals = np.atleast_1d(Tvals).astype(float)
+    DNAvals = np.atleast_1d(to_units(DNAvals, 'bp', 'DNAvals').magnitude)
     #Mobility dependence on size (mu(L)) for each agarose percentage (Ti)
-    ln_mu_LxT = []
-    for Lj in DNAvals:
-        ln_mu_T = []
-        for Ti in Tvals:
-            mu = size_to_mobility(Lj, field, Ti, mu_func,
-                                  dataset, adjmethod, replNANs)
-            ln_mu_T.append(np.log(mu))
-        ln_mu_LxT.append(ln_mu_T)
-    ln_mu_LxT = np.array(ln_mu_LxT)
+    ln_mu_LxT = np.log(sizes_to_mobilities(DNAvals, field, Tvals, mu_func,
+                                           dataset, adjmethod, replNANs))
     #Linear regression for each DNA size
-    lregr_stats = []
-    exclude = []
-    for l in xrange(len(DNAvals)):
-        not_nan = np.logical_not(np.isnan(ln_mu_LxT[l]))
-        if sum(not_nan) > 1:
-            #(enough points for linear regression)
-            gradient, intercept, r_value, p_value, std_err =\
-                      stats.linregress(Tvals[not_nan], ln_mu_LxT[l][not_nan])
-            lregr_stats.append((gradient, intercept, r_value, p_value, std_err))
-            exclude.append(False)
-        else:
-            exclude.append(True)
-    exclude = np.array(exclude)
-    DNAvals = DNAvals[~exclude]
-    ln_mu_LxT = ln_mu_LxT[~exclude]
-    if len(lregr_stats)>0:
+    gradients, intercepts, fit = ferguson_regressions(Tvals, ln_mu_LxT)
+    DNAvals = DNAvals[fit]
+    ln_mu_LxT = ln_mu_LxT[fit]
+    if len(intercepts)>0:
         #Free solution mobility determination
-        ln_mu0 = np.mean([row[1] for row in lregr_stats])  #mean of intercepts
+        ln_mu0 = np.mean(intercepts)  #mean of intercepts
         mu0 = np.exp(ln_mu0)  # cm^2/(V.seg)
     else:
         mu0 = None
+    mu0_cache[key] = (dataset, mu_func, mu0)
     if plot and len(ln_mu_LxT)>0:
+        from matplotlib import pyplot as plt, cm
         #Ferguson Plot (ln(mu) vs. %T) --> mu0
         regline = lambda m, b, x: m*x+b #Line function (for the plot)
         colors = cm.rainbow(np.linspace(0, 1, len(DNAvals)))
@@ -657,8 +1466,8 @@ def ferguson_to_mu0(field, Tvals, DNAvals, dataset, mu_func,
         for l in xrange(len(DNAvals)):
             ax.scatter(Tvals, ln_mu_LxT[l], label=DNAvals[l],
                        color=colors[l])
-            m = lregr_stats[l][0]
-            b = lregr_stats[l][1]
+            m = gradients[l]
+            b = intercepts[l]
             ax.plot(Tvals0, [regline(m, b, t) for t in Tvals0],
                     color=colors[l])
         ax.set_xlim(0)
@@ -676,82 +1485,440 @@ def ferguson_to_mu0(field, Tvals, DNAvals, dataset, mu_func,
     return mu0  # cm^2/(V.seg)
 
 
+frontiers_cache = LRUCache(256)
+
+def regime_frontiers(temperature, a, mu0, field):
+    '''
+    Diffusion regime frontiers, in number of occupied pores: accelerated
+    to plateau reptation (N_lim1), equilibrium to accelerated reptation
+    (N_lim2) and Ogston-Zimm to Rouse (N_lim3).
+    Unit-free (SI units) and memoized on (<temperature>, pore size <a>,
+    <mu0>, <field>).
+    '''
+    key = (temperature, a, mu0, field)
+    if key not in frontiers_cache:
+        kB, qeff, b, l, lp = [constants_SI[k] for k in
+                              ('kB', 'qeff', 'b', 'l', 'lp')]
+        eta = H2Oviscosity(Q_(temperature, 'K')).to('kg/m/s').magnitude
+        epsilon = reduced_field(eta, a, mu0, field, kB, temperature)
+        N_lim3 = Zimm_Rouse(2E3, [kB, temperature, qeff, eta, mu0, a, b, l,
+                                  lp])
+        frontiers_cache[key] = (accel_plateau(epsilon), equil_accel(epsilon),
+                                N_lim3)
+    return frontiers_cache[key]
+
+
+def band_rows(distances, bandwidths, intensities, pxl_y, res, Itol, FWTM):
+    """
+    Returns the rows (pixels), band indices and intensities of the pixel
+    rows covered by the Gaussian profiles of a set of bands (distances and
+    bandwidths in cm, res in px/cm). Starting at the row of its center, each
+    band extends outwards, in both directions, until its intensity falls to
+    <Itol> or the gel's borders (0, <pxl_y>) are reached.
+    """
+    distances = np.asarray(distances, float)
+    maxI = np.asarray(intensities, float)
+    bandwidths = np.asarray(bandwidths, float)
+    # w=FWHM or w=FWTM ???
+    std_dev = Gauss_dev(Gauss_FWHM(bandwidths) if FWTM else bandwidths)
+    pxlYmid = np.round(distances * res).astype(int)
+    # Distance from the center at which the intensity falls to Itol
+    # (spans are widened by one row and refined with the exact condition)
+    ratio = np.maximum(maxI, Itol) / Itol
+    half = std_dev * np.sqrt(2*np.log(ratio))
+    first = np.maximum(np.floor((distances - half) * res).astype(int) - 1, 0)
+    first = np.minimum(first, pxlYmid)
+    last = np.minimum(np.ceil((distances + half) * res).astype(int) + 1,
+                      pxl_y - 1)
+    counts = np.maximum(last - first + 1, 0)
+    band = np.repeat(np.arange(len(distances)), counts)
+    rows = (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts,
+                                                counts) + first[band])
+    ctr, hgt, dev, mid = distances[band], maxI[band], std_dev[band], pxlYmid[band]
+    I = Gaussian(rows / res, hgt, ctr, dev)
+    # A row is painted if the previous one (towards the center) is above Itol
+    prev = np.where(rows < mid, rows + 1, rows - 1)
+    prevI = Gaussian(prev / res, hgt, ctr, dev)
+    painted = ((rows == mid) | (prev == mid) | (prevI > Itol)) & (rows < pxl_y)
+    I[rows == mid] = hgt[rows == mid]
+    return rows[painted], band[painted], I[painted]
+
+
+def lane_profiles(distances, bandwidths, intensities, pxl_y, res, Itol,
+                  FWTM):
+    """
+    Returns the 1-D intensity profile (<pxl_y> pixel rows) of every lane,
+    given the <distances>, <bandwidths> (cm) and <intensities> of its bands
+    (see <band_rows>).
+    """
+    profiles = []
+    for i in xrange(len(distances)):
+        if len(distances[i]) == 0:
+            profiles.append(np.zeros(pxl_y))
+            continue
+        rows, band, I = band_rows(distances[i], bandwidths[i], intensities[i],
+                                  pxl_y, res, Itol, FWTM)
+        profiles.append(np.bincount(rows, weights=I, minlength=pxl_y))
+    return profiles
+
+
+def paint_profiles(image, profiles, col_spans, row0=0):
+    """
+    Adds (in place) the lane <profiles> across the pixel columns of each
+    lane (<col_spans>) of <image>, whose first row is the row <row0> of
+    the gel (<image> may be a horizontal strip of the gel).
+    """
+    nrows = image.shape[0]
+    for profile, (from_x, to_x) in zip(profiles, col_spans):
+        profile = profile[row0:row0+nrows]
+        image[:, from_x:to_x] += profile.reshape((-1,) + (1,)*(image.ndim-1))
+    return image
+
+
+def rasterize_bands(image, distances, bandwidths, intensities, col_spans,
+                    res, Itol, FWTM):
+    """
+    Adds (in place) the Gaussian band profiles of every lane to <image>.
+    <distances>, <bandwidths> (cm) and <intensities> are given per lane and
+    <col_spans> holds the first and last (excluded) pixel columns of each
+    lane. Each lane's profile is computed for all its bands at once (see
+    <band_rows>) and added across its columns in one operation.
+    """
+    profiles = lane_profiles(distances, bandwidths, intensities,
+                             image.shape[0], res, Itol, FWTM)
+    return paint_profiles(image, profiles, col_spans)
+
+
+def intensity_scale(back_col, run_back_col):
+    '''
+    Factor that rescales band intensities normalized for the background
+    <run_back_col> (see <Gel.run>) to the background <back_col>, so that
+    the bands still saturate as set by the <exposure> of the run.
+    '''
+    if back_col == run_back_col:
+        return 1
+    assert run_back_col < 1, ("The background of a run with back_col=1 "
+                              "cannot be changed: re-run the gel instead.")
+    return (1 - back_col) / (1 - run_back_col)
+
+
+def add_background(image, back_col, noise, rows=256):
+    """
+    Adds (in place) the background color <back_col> to <image>, with
+    Gaussian noise of standard deviation <noise>. The noise is generated
+    in blocks of <rows> pixel rows, so that no full-size temporary array
+    is needed.
+    """
+    if noise is None or noise <= 0:
+        image += back_col
+    else:
+        for i in xrange(0, len(image), rows):
+            block = image[i:i+rows]
+            block += np.random.normal(back_col, noise, block.shape)
+    return image
+
+
+def quantize_image(image, dtype=np.uint8):
+    """
+    Converts a grayscale <image> with values in [0, 1] to the integer type
+    <dtype> (np.uint8 or np.uint16), using its full range. Floating point
+    types return the <image> itself.
+    """
+    dtype = np.dtype(dtype)
+    if dtype.kind == 'f':
+        return image.astype(dtype, copy=False)
+    image = image * np.iinfo(dtype).max
+    np.rint(image, out=image)
+    return image.astype(dtype)
+
+
+def convolve_lateral(image, dev, rows=256):
+    """
+    Convolves (in place) every row of <image> with a normalized Gaussian of
+    standard deviation <dev> (px), spreading the bands across the lanes'
+    width (perpendicular to the run). The convolution is separable (the
+    profile along the run is already Gaussian) and done by FFT over blocks
+    of <rows> rows, zero-padded so that nothing wraps around the image.
+    """
+    if dev is None or dev <= 0:
+        return image
+    width = image.shape[1]
+    radius = int(np.ceil(4*dev))
+    nfft = width + 2*radius
+    x = np.arange(-radius, radius+1)
+    kernel = np.exp(-x**2/(2*dev**2))
+    kernel = np.fft.rfft(kernel/kernel.sum(), nfft)
+    for i in xrange(0, len(image), rows):
+        block = image[i:i+rows]
+        spectrum = np.fft.rfft(block, nfft, axis=1)
+        block[:] = np.fft.irfft(spectrum*kernel, nfft,
+                                axis=1)[:, radius:radius+width]
+    return image
+
+
+def gel_geometry(gel_len, wellx, wellsep, res):
+    """
+    Returns the image size (pxl_x, pxl_y), the lane centers (cm) and the
+    lane pixel column spans of a gel (lengths in cm, <wellx> per lane,
+    <res> in px/cm).
+    """
+    wellx = np.asarray(wellx, float)
+    nlanes = len(wellx)
+    gel_width = wellx.sum() + (nlanes+1)*wellsep  # cm
+    pxl_x = int(round(gel_width * res))
+    pxl_y = int(round(gel_len * res))
+    centers = (np.arange(1, nlanes+1)*wellsep + np.cumsum(wellx)
+               - 0.5*wellx)
+    bandlengths = wellx
+    col_spans = [(int(round((centers[i] - bandlengths[i]/2.0) * res)),
+                  int(round((centers[i] + bandlengths[i]/2.0) * res)))
+                 for i in xrange(nlanes)]
+    return pxl_x, pxl_y, centers, col_spans
+
+
+def render_gel(distances, bandwidths, intensities, gel_len, wellx, wellsep,
+               res, back_col, noise, Itol, FWTM, dtype=np.float32,
+               lateral_dev=None):
+    """
+    Headless gel raster engine. Returns the image of the gel as a single
+    channel (grayscale) array of shape (pxl_y, pxl_x), with values in [0, 1]
+    or quantized to <dtype> (np.uint8, np.uint16), together with the
+    centers of the lanes (cm) and their pixel column spans.
+    Colors are left to display time (e.g. a matplotlib colormap).
+    All lengths are given in cm (<distances> and <bandwidths> per lane,
+    <wellx> per lane, <lateral_dev>) and <res> in px/cm.
+    If <lateral_dev> is given, the bands are spread across the lanes by a
+    Gaussian of that standard deviation (see <convolve_lateral>).
+    """
+    pxl_x, pxl_y, centers, col_spans = gel_geometry(gel_len, wellx, wellsep,
+                                                    res)
+    image = np.zeros(shape=(pxl_y, pxl_x), dtype=np.float32)
+    # Paint the bands
+    rasterize_bands(image, distances, bandwidths, intensities, col_spans,
+                    res, Itol, FWTM)
+    if lateral_dev:
+        convolve_lateral(image, lateral_dev * res)
+    # Background color
+    add_background(image, back_col, noise)
+    # Saturation
+    np.clip(image, 0, 1, out=image)
+    return quantize_image(image, dtype), centers, col_spans
+
+
+def render_gel_tiles(distances, bandwidths, intensities, gel_len, wellx,
+                     wellsep, res, back_col, noise, Itol, FWTM,
+                     dtype=np.uint8, tile_rows=512, lateral_dev=None):
+    """
+    Tiled version of <render_gel>. Yields the image of the gel in
+    horizontal strips of <tile_rows> pixel rows, from top to bottom, so
+    that memory usage depends on the tile size and not on the resolution.
+    Only the 1-D lane profiles are kept for the whole gel.
+    """
+    pxl_x, pxl_y, centers, col_spans = gel_geometry(gel_len, wellx, wellsep,
+                                                    res)
+    profiles = lane_profiles(distances, bandwidths, intensities, pxl_y, res,
+                             Itol, FWTM)
+    for row0 in xrange(0, pxl_y, tile_rows):
+        tile = np.zeros(shape=(min(tile_rows, pxl_y-row0), pxl_x),
+                        dtype=np.float32)
+        paint_profiles(tile, profiles, col_spans, row0)
+        if lateral_dev:
+            convolve_lateral(tile, lateral_dev * res)
+        add_background(tile, back_col, noise)
+        np.clip(tile, 0, 1, out=tile)
+        yield quantize_image(tile, dtype)
+
+
+def _png_chunk(tag, data):
+    return (struct.pack('>I', len(data)) + tag + data +
+            struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff))
+
+
+def _image_tiles(tiles, width, height):
+    """
+    Checks the image strips <tiles> of <write_png> and <write_tiff> before
+    anything is written. Returns the first strip and an iterator over all
+    of them.
+    """
+    tiles = iter(tiles)
+    first = next(tiles, None)
+    if first is None:
+        raise ValueError("No image strips to write.")
+    if first.dtype not in (np.uint8, np.uint16):
+        raise ValueError("Image strips must be uint8 or uint16 arrays, "
+                         "not %s." %first.dtype)
+    if first.ndim != 2 or first.shape[1] != width or height < 1:
+        raise ValueError("Image strips of shape %s do not fit a %dx%d "
+                         "image." %(first.shape, width, height))
+    return first, chain([first], tiles)
+
+
+def write_png(fname, tiles, width, height, res=None):
+    """
+    Streams the grayscale image strips <tiles> (uint8 or uint16 arrays of
+    <width> columns, from top to bottom, <height> rows in total) to the PNG
+    file <fname>. <res> (px/cm), if given, is stored as the image's
+    physical resolution.
+    The file is only replaced once the whole image is written (see
+    <write_atomic>).
+    """
+    first, tiles = _image_tiles(tiles, width, height)
+    write_atomic(fname, _write_png, tiles, width, height,
+                 8 * first.dtype.itemsize, res)
+
+
+def _write_png(f, tiles, width, height, bits, res):
+    """Writes the PNG file of <write_png> to the open file <f>."""
+    f.write(b'\x89PNG\r\n\x1a\n')
+    f.write(_png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, bits,
+                                            0, 0, 0, 0)))
+    if res is not None:
+        ppm = int(round(res * 100))  # pixels per meter
+        f.write(_png_chunk(b'pHYs', struct.pack('>IIB', ppm, ppm, 1)))
+    compressor = zlib.compressobj()
+    nrows = 0
+    for tile in tiles:
+        rows = np.zeros((len(tile), 1 + width*tile.dtype.itemsize),
+                        dtype=np.uint8)  # filter type 0 (None)
+        rows[:, 1:] = tile.astype(tile.dtype.newbyteorder('>')).view(
+            np.uint8).reshape(len(tile), -1)
+        data = compressor.compress(rows.tobytes())
+        if data:
+            f.write(_png_chunk(b'IDAT', data))
+        nrows += len(tile)
+    assert nrows == height, "Number of rows (%d) != height (%d)" %(nrows,
+                                                                 height)
+    f.write(_png_chunk(b'IDAT', compressor.flush()))
+    f.write(_png_chunk(b'IEND', b''))
+
+
+def write_tiff(fname, tiles, width, height, res=None):
+    """
+    Streams the grayscale image strips <tiles> (uint8 or uint16 arrays of
+    <width> columns, from top to bottom, <height> rows in total, all but
+    the last with the same number of rows) to the uncompressed TIFF file
+    <fname>, one TIFF strip per tile. <res> (px/cm), if given, is stored
+    as the image's physical resolution.
+    The file is only replaced once the whole image is written (see
+    <write_atomic>).
+    """
+    first, tiles = _image_tiles(tiles, width, height)
+    write_atomic(fname, _write_tiff, tiles, width, height,
+                 8 * first.dtype.itemsize, len(first), res)
+
+
+def _write_tiff(f, tiles, width, height, bits, rows_per_strip, res):
+    """Writes the TIFF file of <write_tiff> to the open file <f>."""
+    f.write(b'II*\x00' + struct.pack('<I', 0))  # IFD offset set at the end
+    offsets = []
+    counts = []
+    for tile in tiles:
+        offsets.append(f.tell())
+        data = tile.astype(tile.dtype.newbyteorder('<')).tobytes()
+        counts.append(len(data))
+        f.write(data)
+    assert sum(counts) == width*height*bits//8, "Incomplete image."
+    # Out of line values (arrays and rationals)
+    if f.tell() % 2:
+        f.write(b'\x00')
+    extra = {}
+    for tag, values in ((273, offsets), (279, counts)):
+        if len(values) > 1:
+            extra[tag] = f.tell()
+            f.write(struct.pack('<%dI' %len(values), *values))
+    res = int(round(res*1000)) if res is not None else 1000
+    extra[282] = extra[283] = f.tell()
+    f.write(struct.pack('<II', res, 1000))
+    ifd_offset = f.tell()
+    entries = [(256, 4, 1, width), (257, 4, 1, height),
+               (258, 3, 1, bits), (259, 3, 1, 1),  # no compression
+               (262, 3, 1, 1),  # black is zero
+               (273, 4, len(offsets), extra.get(273, offsets[0])),
+               (277, 3, 1, 1), (278, 4, 1, rows_per_strip),
+               (279, 4, len(counts), extra.get(279, counts[0])),
+               (282, 5, 1, extra[282]), (283, 5, 1, extra[283]),
+               (296, 3, 1, 3)]  # resolution unit: cm
+    f.write(struct.pack('<H', len(entries)))
+    for tag, typ, n, value in entries:
+        fmt = '<HHIHH' if typ == 3 and n == 1 else '<HHII'
+        f.write(struct.pack(fmt, tag, typ, n, value, 0)
+                if typ == 3 and n == 1 else
+                struct.pack(fmt, tag, typ, n, value))
+    f.write(struct.pack('<I', 0))  # no more IFDs
+    f.seek(4)
+    f.write(struct.pack('<I', ifd_offset))
+
+
+def write_npz(fname, arrays):
+    """
+    Writes the (name, array) pairs of the iterable <arrays> to the .npz
+    archive <fname> (see np.load) one at a time, so that, unlike np.savez,
+    they are never all held in memory.
+    """
+    with zipfile.ZipFile(fname, 'w', zipfile.ZIP_DEFLATED,
+                         allowZip64=True) as archive:
+        for name, array in arrays:
+            data = StringIO()
+            np.lib.format.write_array(data, np.asanyarray(array))
+            archive.writestr(name + '.npy', data.getvalue())
+
+
+def write_video(fname, frames, fps=10, writer='ffmpeg', dpi=100):
+    """
+    Streams the grayscale <frames> (2-D arrays of equal shape, values in
+    [0, 1]) to the video file <fname>, one pixel per image pixel, with the
+    matplotlib movie <writer> (which needs its external program, e.g.
+    ffmpeg).
+    """
+    from matplotlib import pyplot as plt, cm, animation
+    frames = iter(frames)
+    frame = next(frames)
+    height, width = frame.shape
+    fig = plt.figure(figsize=(width/dpi, height/dpi), dpi=dpi)
+    ax = fig.add_axes([0, 0, 1, 1])
+    ax.axis('off')
+    img = ax.imshow(frame, cmap=cm.gray, vmin=0, vmax=1, aspect='auto',
+                    interpolation='none')
+    movie = animation.writers[writer](fps=fps)
+    with movie.saving(fig, fname, dpi):
+        movie.grab_frame()
+        for frame in frames:
+            img.set_data(frame)
+            movie.grab_frame()
+    plt.close(fig)
+
 
 def gelplot_imshow(distances, bandwidths, intensities, lanes, names,
                    gel_len, wellx, welly, wellsep, res, cursor_ovr,
                    back_col, band_col, well_col, noise, Itol, title,
-                   FWTM, show=True):
+                   FWTM, show=True, lateral_dev=None):
     """
     At some point this will have a description...
     """
+    from matplotlib import pyplot as plt, cm
+    from matplotlib.ticker import FixedLocator
+    from mpldatacursor import datacursor  # version 0.5.0
     nlanes = len(lanes)
     gel_width = sum(wellx) + (nlanes+1)*wellsep  # cm
     res = res.to('px/cm')
-    pxl_x = int(round(gel_width * res))
-    pxl_y = int(round(gel_len * res))
-    centers = [(l+1)*wellsep + sum(wellx[:l]) + 0.5*wellx[l]
-               for l in xrange(nlanes)]
-    rgb_arr = np.zeros(shape=(pxl_y, pxl_x, 3), dtype=np.float32)
+    if lateral_dev is not None:
+        lateral_dev = to_units(lateral_dev, 'cm', 'lateral_dev').magnitude
+    gray_arr, centers, col_spans = render_gel(
+        [to_units(d, 'cm').magnitude for d in distances],
+        [to_units(w, 'cm').magnitude for w in bandwidths],
+        [to_units(I, 'dimensionless').magnitude for I in intensities],
+        gel_len.to('cm').magnitude, wellx.to('cm').magnitude,
+        wellsep.to('cm').magnitude, res.magnitude, back_col, noise, Itol,
+        FWTM, lateral_dev=lateral_dev)
     bandlengths = wellx
-    # Paint the bands
-    for i in xrange(nlanes):
-        distXmid = centers[i]
-        pxlXmid = distXmid * res
-        bandlength = bandlengths[i]
-        from_x = int(round((distXmid - bandlength/2.0) * res))
-        to_x   = int(round((distXmid + bandlength/2.0) * res))
-        for j in xrange(len(lanes[i])):
-            distYmid = distances[i][j]
-            pxlYmid = int(round(distYmid * res))
-            bandwidth = bandwidths[i][j]  # w=FWHM or w=FWTM ???
-            if FWTM:
-                FWHM = Gauss_FWHM(bandwidth)
-            else:
-                FWHM = bandwidth
-            std_dev = Gauss_dev(FWHM)
-            maxI = intensities[i][j]
-            midI = Gaussian(distYmid, maxI, distYmid, std_dev)
-            if pxlYmid < len(rgb_arr):  # band within gel frontiers
-                rgb_arr[pxlYmid, from_x:to_x] += midI
-            bckwdYstop = False if pxlYmid > 0 else True
-            forwdYstop = False if pxlYmid < len(rgb_arr)-1 else True
-            pxlYbck = pxlYmid-1
-            pxlYfor = pxlYmid+1
-            while not bckwdYstop or not forwdYstop:
-                if not bckwdYstop:
-                    distYbck = Q_(pxlYbck,'px')/res
-                    bckYI = Gaussian(distYbck, maxI, distYmid, std_dev)
-                    if pxlYbck < len(rgb_arr):
-                        rgb_arr[pxlYbck, from_x:to_x] += bckYI
-                    pxlYbck -= 1
-                    if bckYI <= Itol or pxlYbck == -1:
-                        bckwdYstop = True
-                if not forwdYstop:
-                    distYfor = Q_(pxlYfor,'px')/res
-                    forYI = Gaussian(distYfor, maxI, distYmid, std_dev)
-                    rgb_arr[pxlYfor, from_x:to_x] += forYI
-                    pxlYfor += 1
-                    if forYI <= Itol or pxlYfor == pxl_y:
-                        forwdYstop = True
-    # Background color
-    if noise is None or noise <= 0:
-        rgb_arr += back_col
-    else:
-        bckg = np.random.normal(back_col, noise,
-                                (len(rgb_arr), len(rgb_arr[0])))
-        rgb_arr += bckg[:,:,np.newaxis]
-    # Saturation
-    rgb_arr[rgb_arr > 1] = 1
-    rgb_arr[rgb_arr < 0] = 0
-    #bands_arr = np.ma.masked_where(rgb_arr == back_col, rgb_arr)  #############
-    bands_arr = rgb_arr
+    #bands_arr = np.ma.masked_where(gray_arr == back_col, gray_arr)  ###########
+    bands_arr = gray_arr
     # Plot
     gel_len = gel_len.magnitude
     gel_width = gel_width.magnitude
     wellx = wellx.magnitude
     welly = welly.magnitude
     wellsep = wellsep.magnitude
-    centers = [c.magnitude for c in centers]
     bandlengths = bandlengths.magnitude
     bandwidths = [[bw.magnitude for bw in bwlane] for bwlane in bandwidths]
     fig = plt.figure()
@@ -774,7 +1941,7 @@ def gelplot_imshow(distances, bandwidths, intensities, lanes, names,
     ax1.yaxis.set_minor_locator(minorLocator)
     ax1.tick_params(axis='x', which='both', top='off')
     bands_plt = ax1.imshow(bands_arr, extent=[0, gel_width, gel_len, 0],
-                           interpolation='none')
+                           interpolation='none', cmap=cm.gray, vmin=0, vmax=1)
     # Draw wells
     for i in xrange(nlanes):
         ctr = centers[i]
@@ -827,6 +1994,45 @@ def gelplot_imshow(distances, bandwidths, intensities, lanes, names,
 
 
 
+def solute_key(solute):
+    '''
+    Hashable fingerprint of a solute, consistent with its equality: its
+    own <fingerprint> (e.g. <Fragment>), the (case insensitive) strands and
+    overhang of Dseq-like objects, the sequence, name and id of records, or
+    the solute itself otherwise.
+    '''
+    if hasattr(solute, 'fingerprint'):
+        return solute.fingerprint()
+    if hasattr(solute, 'watson') and hasattr(solute, 'crick'):
+        return ('dseq', solute.watson.lower(), solute.crick.lower(),
+                solute.ovhg)
+    if hasattr(solute, 'seq'):
+        return ('record', solute_key(solute.seq),
+                getattr(solute, 'name', None), getattr(solute, 'id', None))
+    try:
+        hash(solute)
+    except TypeError:
+        return ('object', id(solute))
+    return ('value', solute)
+
+
+def pool(samples):
+    '''
+    Mixes <samples> into a new sample (same as adding them, but in a single
+    pass): volumes are added and the quantities of equal solutes summed.
+    '''
+    samples = list(samples)
+    assert samples, "Nothing to pool."
+    units = samples[0].quantities.units
+    solutes = [sol for sample in samples for sol in sample.solutes]
+    quantities = np.concatenate([sample.quantities.to(units).magnitude
+                                 for sample in samples])
+    volume = sum([sample.volume for sample in samples[1:]],
+                 samples[0].volume)
+    endless = all([sample.endless for sample in samples])
+    return Sample(solutes, Q_(quantities, units), volume, endless)
+
+
 class Sample:
     '''
     A rudimentary sample object to serve as DNA container.
@@ -860,20 +2066,27 @@ class Sample:
         quantities = to_units(qty_list, quantities.units, 'quantities')
         self.volume = volume
         self.endless = endless
+        # Unique solutes: index from solute fingerprint to row
+        self.index = {}
+        uniqSols = []
+        rows = np.empty(len(solutes), dtype=int)
+        for i, sol in enumerate(solutes):
+            key = solute_key(sol)
+            j = self.index.get(key)
+            if j is None:
+                j = self.index[key] = len(uniqSols)
+                uniqSols.append(sol)
+            rows[i] = j
         if len(solutes) > 0:
-            uniqSols = []
-            uniqQtis = []
-            for i, sol in enumerate(solutes):
-                if sol in uniqSols:
-                    j = uniqSols.index(sol)
-                    uniqQtis[j] += quantities[i].magnitude
-                else:
-                    uniqSols.append(sol)
-                    uniqQtis.append(quantities[i].magnitude)
-            solutes = uniqSols
-            quantities = Q_(uniqQtis, quantities.units)
-        self.solutes = solutes
+            magnitudes = quantities.magnitude[:len(solutes)]
+            if len(uniqSols) < len(solutes):
+                magnitudes = np.bincount(rows, weights=magnitudes,
+                                         minlength=len(uniqSols))
+            quantities = Q_(magnitudes, quantities.units)
+        self.solutes = uniqSols
         self.quantities = quantities
+        self.sizes = np.array([len(sol) for sol in uniqSols], dtype=int)  # bp
+        self.shared = False  # data shared with other samples (copy-on-write)
 
     def __repr__(self):
         return ("<sample: vol=%s%s, %d solutes (%s)>"
@@ -947,11 +2160,12 @@ class Sample:
     def __eq__(self, other):
         if self.volume != other.volume or self.endless != other.endless:
             return False
-        Sols, Qtis = zip(*sorted(zip(self.solutes, self.quantities)))
-        otherSols, otherQtis = zip(*sorted(zip(other.solutes, other.quantities)))
-        if Sols != otherSols or Qtis != otherQtis:
+        if len(self) != len(other) or set(self.index) != set(other.index):
             return False
-        return True
+        rows = [other.index[key] for key in self.index]
+        otherQtis = other.quantities.to(self.quantities.units).magnitude[rows]
+        return np.array_equal(self.quantities.magnitude[self.index.values()],
+                              otherQtis)
 
     def __ne__(self, other):
         if self == other:
@@ -960,19 +2174,7 @@ class Sample:
             return True
 
     def __add__(self, other):
-        totalVol = self.volume + other.volume
-        endless = self.endless and other.endless
-        solutes = self.solutes[:]
-        quantities = self.quantities.tolist()
-        for i, sol in enumerate(other.solutes):
-            if sol in solutes:
-                j = solutes.index(sol)
-                quantities[j] += other.quantities[i]
-            else:
-                solutes.append(sol)
-                quantities.append(other.quantities[i])
-        quantities = to_units(quantities, self.quantities.units)
-        return Sample(solutes, quantities, totalVol, endless)
+        return pool([self, other])
 
     def __radd__(self, other):
         if other == 0:
@@ -999,14 +2201,52 @@ class Sample:
 
     def add_solute(self, solute, quantity):
         """Add a quantity of solute to the sample."""
-        if solute in self.solutes:
-            i = self.solutes.index(solute)
-            self.quantities[i] += quantity
+        self.own()
+        key = solute_key(solute)
+        if key in self.index:
+            self.quantities[self.index[key]] += quantity
         else:
+            self.index[key] = len(self.solutes)
             self.solutes.append(solute)
-            quantities = self.quantities.tolist()
-            quantities.append(quantity)
-            self.quantities = to_units(quantities, self.quantities.units)
+            self.sizes = np.append(self.sizes, len(solute))
+            quantity = to_units(quantity, self.quantities.units, 'quantity')
+            self.quantities = Q_(np.append(self.quantities.magnitude,
+                                           quantity.magnitude),
+                                 self.quantities.units)
+
+    def row(self, solute):
+        """Returns the index of <solute> in the sample."""
+        try:
+            return self.index[solute_key(solute)]
+        except KeyError:
+            raise ValueError("%r is not in the sample." %(solute,))
+
+    def derive(self, quantities, volume, endless):
+        """
+        Returns a new sample with the (already unique) solutes of this one
+        and the given <quantities>, <volume> and <endless> state. The
+        solutes are shared until either sample is modified (copy-on-write).
+        """
+        sample = Sample(volume=volume, endless=endless)
+        sample.solutes = self.solutes
+        sample.quantities = quantities
+        sample.sizes = self.sizes
+        sample.index = self.index
+        sample.shared = self.shared = True
+        return sample
+
+    def share(self):
+        """Return a copy-on-write copy of the sample (see <derive>)."""
+        return self.derive(self.quantities, self.volume, self.endless)
+
+    def own(self):
+        """Copies the data this sample shares with others, if any."""
+        if self.shared:
+            self.solutes = self.solutes[:]
+            self.quantities = self.quantities.copy()
+            self.sizes = self.sizes.copy()
+            self.index = dict(self.index)
+            self.shared = False
 
     def aliquot(self, vol, endless=False):
         """Return a new sample corresponding to an aliquot of this sample."""
@@ -1020,17 +2260,18 @@ class Sample:
             quantities = self.quantities * vol/self.volume
             endless = endless if endless is not None else self.endless
             if not self.endless:
+                self.own()
                 self.volume -= vol
                 self.quantities -= quantities
-            return Sample(self.solutes, quantities, vol, endless)
+            return self.derive(quantities, vol, endless)
 
     def duplicate(self):
-        """Return deep copy of sample."""
-        return Sample(self.solutes, self.quantities, self.volume, self.endless)
+        """Return copy of sample."""
+        return self.share()
 
     def stocksolution(self):
-        """Return an endless deep copy of sample."""
-        return Sample(self.solutes, self.quantities, self.volume, True)
+        """Return an endless copy of sample."""
+        return self.derive(self.quantities, self.volume, True)
 
     def concentrations(self):
         """Returns the concentration of every solute."""
@@ -1041,7 +2282,7 @@ class Sample:
         If index and solute are not given, returns all concentrations.
         """
         if index is None and solute is not None:
-            index = self.solutes.index(solute)
+            index = self.row(solute)
         if index is not None:
             return self.quantities[index]/self.volume
         else:
@@ -1072,7 +2313,7 @@ class Sample:
             finalCon = dim_or_units(finalCon, Q_(1, 'ng/ul'))
         if index is None and finalCon is not None:
             if solute is not None:
-                index = self.solutes.index(solute)
+                index = self.row(solute)
             else:
                 index = 0
         if factor is not None:
@@ -1091,6 +2332,21 @@ class Gel:
     Notes:
     '''
 
+    # Stages of <run> and the stages each of them depends on
+    run_stages = OrderedDict([('mobilities', ()),
+                              ('fit', ()),
+                              ('mu0', ()),
+                              ('diffusion', ('mobilities', 'fit', 'mu0')),
+                              ('intensities', ('diffusion',))])
+    # Attributes (see <_inputs>) each stage of <run> depends on
+    stage_inputs = dict(mobilities=('samples', 'field', 'percent'),
+                        fit=('field', 'percent', 'DNAspace_for_vWBRfit'),
+                        mu0=('field', 'Tvals_for_mu0', 'DNAspace_for_mu0'),
+                        diffusion=('samples', 'field', 'percent',
+                                   'temperature', 'gel_len', 'wellx',
+                                   'welly', 'wellz', 'volumes'),
+                        intensities=('samples',))
+
     def __init__(self,
                  samples,
                  names = None,
@@ -1120,22 +2376,8 @@ class Gel:
         self.wellz = (to_units(wellz, 'mm', 'wellz') if wellz is not None
                       else wellz)  # well depth
         self.wellsep = to_units(wellsep, 'mm', 'wellsep')  # separation between wells
-        # Volumes
-        wellVol = self.wellx * self.welly * self.wellz
-        wellVol.ito('ul')
-        defaulVol = 0.85 * wellVol
-        volumes = []
-        for sample in self.samples:
-            vol = sample.volume
-            if not np.isnan(vol) and vol is not None:
-                volumes.append(vol)
-            else:
-                volumes.append(defaulVol)
-        self.volumes = to_units(volumes, 'uL', 'volumes')
-        # Quantities
-        defaulQty = Q_(150,'ng')
-        self.quantities = assign_quantitiesB(self.samples, defaulQty)
-        #self.quantities = assign_quantities(self.samples, quantities, defaulQty)
+        self._samples = None
+        self._sample_data()
         self.runtime = np.nan                                        ##########
         self.freesol_mob = None
         self.mobilities = []
@@ -1156,34 +2398,103 @@ class Gel:
         self.vWBR_muS = None
         self.vWBR_muL = None
         self.vWBR_gamma = None
+        self.raster_opts = None
+        self._stages = {}  # stage name: (run options, result)
+        self._run_inputs = None
+
+    def _sample_data(self):
+        '''
+        Volumes and quantities of the samples. Recomputed (and the fragment
+        arrays dropped) whenever the samples change (see <_samples_key>).
+        '''
+        samples_key = self._samples_key()
+        if samples_key == self._samples:
+            return
+        # Volumes
+        wellVol = self.wellx * self.welly * self.wellz
+        wellVol.ito('ul')
+        defaulVol = 0.85 * wellVol
+        volumes = []
+        for sample in self.samples:
+            vol = sample.volume
+            if not np.isnan(vol) and vol is not None:
+                volumes.append(vol)
+            else:
+                volumes.append(defaulVol)
+        self.volumes = to_units(volumes, 'uL', 'volumes')
+        # Quantities
+        defaulQty = Q_(150,'ng')
+        self.quantities = assign_quantitiesB(self.samples, defaulQty)
+        #self.quantities = assign_quantities(self.samples, quantities, defaulQty)
+        self._samples = samples_key
+        self._fragments = None
+
+    def _samples_key(self):
+        '''Key of the sizes, quantities and volumes of the samples.'''
+        return tuple((id(sample), sample.sizes.tostring(),
+                      str(sample.quantities.units),
+                      np.asarray(sample.quantities.magnitude,
+                                 float).tostring(),
+                      str(sample.volume))
+                     for sample in self.samples)
+
+    def _inputs(self):
+        '''
+        Keys of the attributes the stages of <run> depend on (see
+        <stage_inputs>), so that they are recomputed when any of them
+        changes, whether through the <set_*> methods or not.
+        '''
+        key = lambda value, units: (magnitudes_key(value, units)
+                                    if value is not None else None)
+        return dict(samples=self._samples,
+                    field=key(self.field, 'V/cm'),
+                    percent=key(self.percent, '(g/(100 mL))*100'),
+                    temperature=key(self.temperature, 'K'),
+                    gel_len=key(self.gel_len, 'cm'),
+                    wellx=key(self.wellx, 'mm'),
+                    welly=key(self.welly, 'mm'),
+                    wellz=key(self.wellz, 'mm'),
+                    volumes=key(self.volumes, 'ul'),
+                    DNAspace_for_mu0=key(self.DNAspace_for_mu0, 'bp'),
+                    Tvals_for_mu0=key(self.Tvals_for_mu0,
+                                      '(g/(100 mL))*100'),
+                    DNAspace_for_vWBRfit=key(self.DNAspace_for_vWBRfit,
+                                             'bp'))
 
     def set_field(self, electrfield):
         '''At some point this will have a description...'''
         self.field = to_units(electrfield, 'V/cm', 'electrfield')
+        self.invalidate('mobilities', 'fit', 'mu0')
 
     def set_percentgel(self, percentgel):
         '''At some point this will have a description...'''
         self.percent = to_units(percentgel, '(g/(100 mL))*100', 'percentgel')
+        self.invalidate('mobilities', 'fit', 'diffusion')
 
     def set_temperature(self, temperature):
         '''At some point this will have a description...'''
         self.temperature = to_units(temperature, 'K', 'temperature')
+        self.invalidate('diffusion')
 
     def set_gelength(self, gel_len):
         '''At some point this will have a description...'''
         self.gel_len = to_units(gel_len, 'cm', 'gel_len')
+        self.invalidate('diffusion')
 
     def set_wellx(self, wellx):
         '''At some point this will have a description...'''
         self.wellx = to_units(wellx, 'mm', 'wellx')
+        self.invalidate('diffusion')
 
     def set_welly(self, welly):
         '''At some point this will have a description...'''
         self.welly = to_units(welly, 'mm', 'welly')
+        self.invalidate('diffusion')
 
     def set_wellz(self, wellz):
         '''At some point this will have a description...'''
         self.wellz = to_units(wellz, 'mm', 'wellz')
+        self.invalidate('diffusion')
 
     def set_wellsep(self, wellsep):
         '''At some point this will have a description...'''
@@ -1192,15 +2503,198 @@ class Gel:
     def set_DNAspace_for_mu0(self, DNA_space):
         '''At some point this will have a description...'''
         self.DNAspace_for_mu0 = to_units(DNA_space, 'bp', 'DNA_space')
+        self.invalidate('mu0')
 
     def set_Tvals_for_mu0(self, Tvals):
         '''At some point this will have a description...'''
         self.Tvals_for_mu0 = to_units(Tvals, '(g/(100 mL))*100', 'Tvals')
+        self.invalidate('mu0')
 
     def set_DNAspace_for_vWBRfit(self, DNA_space):
         '''At some point this will have a description...'''
         self.DNAspace_for_vWBRfit = to_units(DNA_space, 'bp', 'DNA_space')
+        self.invalidate('fit')
+
+    def _fragment_arrays(self):
+        '''
+        Sample-dependent data of all the fragments in single arrays: sizes
+        (bp), quantities (ng), lane bounds (lane i: bounds[i]:bounds[i+1])
+        and lane index. Computed once per change of the samples (see
+        <_sample_data>).
+        '''
+        if self._fragments is None:
+            sizes = [sample.sizes for sample in self.samples]
+            dna_sizes = np.concatenate(sizes).astype(float)  # bp assumption #
+            bounds = np.cumsum([0] + [len(lane) for lane in sizes])
+            lane_idx = np.repeat(np.arange(len(sizes)), np.diff(bounds))
+            quantities = np.concatenate([to_units(qts, 'ng').magnitude
+                                         for qts in self.quantities])
+            self._fragments = (dna_sizes, quantities.astype(float), bounds,
+                               lane_idx)
+        return self._fragments
+
+    def invalidate(self, *stages):
+        '''
+        Drops the cached results of the run <stages> (all of them if none
+        is given) and of the stages that depend on them (see <run_stages>).
+        '''
+        stages = set(stages or self.run_stages)
+        for name, deps in self.run_stages.items():  # dependencies come first
+            if name in stages or stages.intersection(deps):
+                stages.add(name)
+                self._stages.pop(name, None)
+
+    def _stage(self, name, key, compute, *args):
+        '''
+        Result of the run stage <name>, cached with the run options <key>
+        it depends on (and the keys of its <stage_inputs>). <compute>(*args)
+        is only called if the stage was invalidated or its key changed, in
+        which case the stages depending on it are invalidated too.
+        '''
+        key = (key, tuple(self._run_inputs[attr]
+                          for attr in self.stage_inputs[name]))
+        cached = self._stages.get(name)
+        if cached is None or cached[0] != key:
+            self.invalidate(name)
+            cached = self._stages[name] = (key, compute(*args))
+        return cached[1]
+
+    def _mobilities_stage(self, dataset, mu_func, interpol, replNANs):
+        '''Electrophoretic mobilities (m^2/(V.s)) of all the fragments.'''
+        dna_sizes, quantities, bounds, lane_idx = self._fragment_arrays()
+        if interpol in ('linear', 'nearest'):
+            # Same simplex for every fragment (fixed field and percentage)
+            cond_mu_func = condition_mu_func(self.field, self.percent, dataset,
+                                             interpol, replNANs)
+            mobilities = cond_mu_func(dna_sizes)
+        else:
+            mobilities = sizes_to_mobilities(dna_sizes, self.field,
+                                             self.percent, mu_func, dataset,
+                                             interpol, replNANs)[:, 0]
+        self.mobilities = self._per_lane(mobilities, 'cm**2/V/s')  ##########
+        return mobilities * 1E-4  # m^2/(V.s)
+
+    def _fit_stage(self, dataset, mu_func, interpol, replNANs):
+        '''vWBR eq. parameters muS, muL (m^2/(V.s)) and gamma (bp).'''
+        output = vWBRfit(self.field, self.percent, self.DNAspace_for_vWBRfit,
+                         dataset, mu_func, interpol, replNANs, plot=False)
+        muS, muL, gamma = output[0]  # cm^2/(V.s), cm^2/(V.s), bp            #
+        self.vWBR_muS = Q_(muS, 'cm**2/V/s')
+        self.vWBR_muL = Q_(muL, 'cm**2/V/s')
+        self.vWBR_gamma = Q_(gamma, 'bp')
+        return muS * 1E-4, muL * 1E-4, gamma
+
+    def _mu0_stage(self, dataset, mu_func, interpol, replNANs):
+        '''Free solution mobility estimate (m^2/(V.s)).'''
+        mu0 = ferguson_to_mu0(self.field, self.Tvals_for_mu0,
+                              self.DNAspace_for_mu0, dataset, mu_func,
+                              interpol, replNANs, plot=False)
+        self.freesol_mob = Q_(mu0, 'cm**2/V/s')  #############################
+        return mu0 * 1E-4  # m^2/(V.s)
+
+    def _diffusion_stage(self, mobilities, fit, mu0, geometry, till_len,
+                         till_time):
+        '''
+        Runtime (s), initial and intrinsic diffusional bandwidths (m) and
+        diffusion coefficients (m^2/s) of all the fragments (and their
+        distances).
+        '''
+        # Unit-free computation: magnitudes in SI units (m, s, V, kg, K, A),
+        # DNA sizes in bp and quantities in ng
+        muS, muL, gamma = fit
+        dna_sizes, quantities, bounds, lane_idx = self._fragment_arrays()
+        nlanes = len(self.samples)
+        field = self.field.to('V/m').magnitude              # V/m
+        temperature = self.temperature.to('K').magnitude    # K
+        gel_len = self.gel_len.to('m').magnitude            # m
+        wellx = lane_values(self.wellx, 'm', nlanes)        # m
+        welly = lane_values(self.welly, 'm', nlanes)        # m
+        wellz = (lane_values(self.wellz, 'm', nlanes)
+                 if self.wellz is not None else None)       # m
+        volumes = (lane_values(self.volumes, 'm**3', nlanes)
+                   if self.volumes is not None else None)   # m^3
+        max_dist = till_len * gel_len
+        max_mob = mobilities.max()
+
+        # Time limit
+        time = runtime(max_dist, max_mob, field)  # sec
+        if till_time is not None and till_time < time:
+            time = till_time
+        self.runtime = Q_(time, 's')
+
+        # Distances
+        distances = rundistance(time, mobilities, field)  # m
+        self.distances = self._per_lane(distances, 'm', 'cm')
+
+        # Initial bandwidths
+        if geometry == 'horizontal':
+            dist0 = welly
+        elif volumes is not None and wellz is not None: #vertical geometry
+            dist0 = volumes/(wellx*wellz)
+        else:
+            dist0 = 0.5*welly  ### assumption #################################
+        time0 = dist0/(mu0*field)
+        bandwidths0 = mobilities*time0[lane_idx]*field  # m
+        self.bandwidths0 = self._per_lane(bandwidths0, 'm', 'cm')
+
+        # Intrinsic diffusional bandwidths
+        lp = constants_SI['lp']      # m
+        l = constants_SI['l']        # m
+        b = constants_SI['b']        # m/bp
+        kB = constants_SI['kB']      # m^2.kg/(s^2.K)
+        qeff = constants_SI['qeff']  # A.s/bp
+        eta = H2Oviscosity(self.temperature).to('kg/m/s').magnitude
+        self.H2Oviscosity = Q_(eta, 'kg/m/s')
+        a = pore_size(gamma, muL, mu0, lp, b)  # m
+        a_fit = pore_size_fit(self.percent).to('m').magnitude  ##############
+        self.poresize = Q_(a, 'm')
+        self.poresize_fit = Q_(a_fit, 'm')
+        # N_lim2:   ***   Major problem    ***   ##########################
+        N_lim1, N_lim2, N_lim3 = regime_frontiers(temperature, a, mu0, field)
+        self.accel_to_plateau = Q_(N_to_Nbp(N_lim1, a, b, l), 'bp')
+        self.equil_to_accel = Q_(N_to_Nbp(N_lim2, a, b, l), 'bp')
+        self.Zimm_to_Rouse = Q_(N_to_Nbp(N_lim3, a, b, l), 'bp')
+        D = diffusion_coefficient(dna_sizes, N_lim1, N_lim2, N_lim3,
+                                  [kB, temperature, qeff, eta, mu0, a, b, l,
+                                   lp], field)  # (m^2/s)
+        bandwidthsI = bandbroadening(D, time)  # m
+        self.bandwidthsI = self._per_lane(bandwidthsI, 'm', 'cm')
+
+        # Total bandwidths
+        bandwidths = bandwidths0 + bandwidthsI
+        self.bandwidths = self._per_lane(bandwidths, 'm', 'cm')
+        return time, bandwidths0, bandwidthsI, D
+
+    def _intensities_stage(self, diffusion, exposure, back_col, bandwidth,
+                           FWTM):
+        '''
+        Normalized peak intensities of all the fragments and their
+        normalization factor.
+        '''
+        time, bandwidths0, bandwidthsI = diffusion[:3]
+        quantities = self._fragment_arrays()[1]
+        bandwidths = [bandwidths0, bandwidthsI,
+                      bandwidths0 + bandwidthsI][bandwidth]
+        # Max intensities
+        # w=FWHM or w=FWTM ???
+        FWHM = Gauss_FWHM(bandwidths) if FWTM else bandwidths
+        std_dev = Gauss_dev(FWHM)
+        auc = quantities  # area under curve proportional to DNA quantity
+        raw_Is = Gauss_hgt(auc, std_dev)  # peak heights
+        maxI = raw_Is.max()
+        minI = raw_Is.min()
 
+        # max intensity normalization
+        satI = maxI+exposure*(minI-maxI)
+        intensities = (1-back_col)/satI*raw_Is
+        self.intensities = self._per_lane(intensities, 'dimensionless')
+        return intensities, (1-back_col)/satI
+
+    def _per_lane(self, values, units, out_units=None):
+        '''Splits the fragment array <values> into per lane quantities.'''
+        bounds = self._fragment_arrays()[2]
+        return [Q_(values[bounds[i]:bounds[i+1]], units).to(out_units or units)
+                for i in xrange(len(self.samples))]
 
     def run(self,
             till_len = 0.75,         # percent of gel_len
@@ -1214,247 +2708,576 @@ class Gel:
             band_col = 1,
             well_col = 0.05,
             noise = 0.015,
-            interpol = 'linear',     # 'cubic','nearest'
+            interpol = 'linear',     # 'cubic','nearest','table'
             dset_name = 'vertical',  # 'horizontal'
-            replNANs = True          # replace NANs by 'nearest' interpolation
+            replNANs = True,         # replace NANs by 'nearest' interpolation
+            lateral_dev = None       # cm, lateral band spread (std. dev.)
             ):
         '''
         At some point this will have a description...
+        The run is done in stages (see <run_stages>) whose results are
+        cached: re-running only recomputes the stages invalidated by the
+        <set_*> methods or by a change of the options, attributes or
+        samples they depend on (see <stage_inputs>), so
+        e.g. a new <exposure> or <back_col> only recomputes the intensities
+        and <noise> only the image.
         '''
         bandwidth = 2  # {0:'well_only', 1:'intrinsic_only', 2:'both'}
         Itol = 1E-5    # intensity tolerance
         FWTM = False   # bandwidth interpreted as FWTM instead of FWHM
         lanes = [sample.solutes for sample in self.samples]
         names = self.names
-        field = self.field              # V/cm
-        percentage = self.percent       # %agarose
-        temperature = self.temperature  # K
-        gel_len = self.gel_len          # cm
-        wellx = self.wellx              # mm
-        welly = self.welly              # mm
-        wellz = self.wellz              # mm
-        wellsep = self.wellsep          # mm
-        volumes = self.volumes          # microliter
-        quantities = self.quantities    # ng
-        dataset = datasets[dset_name]
-        mu_func = mu_funcs[dset_name]
-        DNAspace_mu0 = self.DNAspace_for_mu0
-        DNAspace_vWBRfit = self.DNAspace_for_vWBRfit
+        dataset = get_dataset(dset_name)
+        mu_func = get_mu_func(dset_name)
         if self.Tvals_for_mu0 == []:
             self.Tvals_for_mu0 = Q_(np.unique(dataset['T']),
                                     dataset['T'].units).to('(g/(100 mL))*100')
         else:
             self.Tvals_for_mu0 = to_units(self.Tvals_for_mu0,
                                           '(g/(100 mL))*100', 'Tvals_for_mu0')
-        Tvals = self.Tvals_for_mu0
-        nlanes = len(lanes)
         exposure = 0 if exposure < 0 else 1 if exposure > 1 else exposure #####
-        if not hasattr(wellx.magnitude, '__iter__'):
-            wellx = np.repeat(wellx, nlanes)
-        wellx = wellx.to('cm')
-        if not hasattr(welly.magnitude, '__iter__'):
-            welly = np.repeat(welly, nlanes)
-        welly = welly.to('cm')
-        if wellz is not None:
-            if not hasattr(wellz.magnitude, '__iter__'):
-                wellz = np.repeat(wellz, nlanes)
-            wellz = wellz.to('cm')
-        wellsep = wellsep.to('cm')
-        if volumes is not None:
-        #    if not hasattr(volumes.magnitude, '__iter__'):
-        #        volumes = np.repeat(volumes, nlanes)
-            volumes = volumes.to('cm**3')
         till_len = abs(till_len) if till_len is not None else 1
         if till_time is not None:
-            till_time = to_units(till_time, 'hr', 'till_time').to('s')
+            till_time = to_units(till_time, 'hr', 'till_time').to('s').magnitude
         res = to_units(res, 'px/cm', 'res')
-        max_dist = till_len * gel_len
-
-        # Electrophoretic Mobilities
-        self.mobilities = []
-        for lane in lanes:  ### self.mobs=[]+append  ou self.mobs=None + assign 
-            lane_mobs = []
-            for dna_frag in lane:
-                dna_size = len(dna_frag) * ureg.bp # bp assumption ###### ! ###
-                frag_mob = size_to_mobility(dna_size, field, percentage,
-                                            mu_func, dataset, interpol,
-                                            replNANs)
-                lane_mobs.append(frag_mob)
-            self.mobilities.append(lane_mobs * ureg('cm**2/V/s'))  ############
-        #self.mobilities = Q_(self.mobilities, 'cm**2/V/s')
-        mobilities = self.mobilities
-        max_mob = max([max(lane_mobs) for lane_mobs in mobilities])
-
-        # vWBR eq. parameters muL, muS, gamma
-        output = vWBRfit(field, percentage, DNAspace_vWBRfit, dataset, mu_func,
-                         interpol, replNANs, plot=False)
-        muS, muL, gamma = output[0]
-        muS = Q_(muS, 'cm**2/V/s')                                            #
-        muL = Q_(muL, 'cm**2/V/s')                                            #
-        gamma = Q_(gamma, 'bp')                                               #
-        self.vWBR_muS = muS
-        self.vWBR_muL = muL
-        self.vWBR_gamma = gamma
-
-        # vWBR
-        #mu_func = vWBR(muS, muL, gamma)
-
-        # Time limit
-        time = runtime(max_dist, max_mob, field)  # sec
-        if till_time is not None and till_time < time:
-            time = till_time
-        self.runtime = time
-        
-        # Distances
-        distances = [rundistance(time, lane_mobs, field)
-                     for lane_mobs in mobilities]
-        self.distances = distances
-        
-        # Free solution mobility estimate
-        mu0 = ferguson_to_mu0(field, Tvals, DNAspace_mu0, dataset, mu_func,
-                              interpol, replNANs, plot=False)
-        mu0 = Q_(mu0,'cm**2/V/s')  ############################################
-        self.freesol_mob = mu0
-        
-        # Initial bandwidths
-        if geometry == 'horizontal':
-            dist0 = welly
-        elif volumes is not None and wellz is not None: #vertical geometry
-            dist0 = volumes/(wellx*wellz)
-        else:
-            dist0 = 0.5*welly  ### assumption #################################
-        time0 = dist0/(mu0*field)
-        bandwidths0 = [mobs*time0[l]*field for l, mobs in
-                       enumerate(mobilities)]
-        self.bandwidths0 = bandwidths0
-        
-        # Intrinsic diffusional bandwidths
-        muS = muS.to('m**2/V/s')
-        muL = muL.to('m**2/V/s')
-        mu0 = mu0.to('m**2/V/s')
-        lp = constants['lp'].to('m')
-        l = constants['l'].to('m')
-        b = constants['b'].to('m/bp')
-        kB = constants['kB'].to('m**2*kg/s**2/K')
-        qeff = constants['qeff'].to('A*s/bp')
-        field = field.to('V/m')
-        eta = H2Oviscosity(temperature)
-        self.H2Oviscosity = eta
-        a = pore_size(gamma, muL, mu0, lp, b)
-        a_fit = pore_size_fit(percentage)  ####################################
-        a_fit = a_fit.to('m')              ####################################
-        self.poresize = a
-        self.poresize_fit = a_fit
-        epsilon = reduced_field(eta, a, mu0, field, kB, temperature)
-        Db = Dblob(kB, temperature, eta, a)
-        N_lim1 = accel_plateau(epsilon)    ####################################
-        N_lim2 = equil_accel(epsilon)      ##   ***   Major problem    ***   ##
-        N_lim3 = Zimm_Rouse(Q_(2E3,'bp'),  ####################################
-                            [kB, temperature, qeff, eta, mu0, a, b, l, lp])
-        #print 'N_lim1 = accel_plateau = %s (%s)' %(N_lim1,N_to_Nbp(N_lim1,a,b,l))
-        #print 'N_lim2 = equil_accel = %s (%s)' %(N_lim2,N_to_Nbp(N_lim2,a,b,l))
-        #print 'N_lim3 = Zimm_Rouse = %s (%s)' %(N_lim3,N_to_Nbp(N_lim3,a,b,l))
-        self.accel_to_plateau = N_to_Nbp(N_lim1, a, b, l)
-        self.equil_to_accel = N_to_Nbp(N_lim2, a, b, l)
-        self.Zimm_to_Rouse = N_to_Nbp(N_lim3, a, b, l)
-        for lane in lanes:
-            lane_widths = []
-            for dna_frag in lane:
-                Nbp = len(dna_frag) * ureg.bp  ### assumption #################
-                N = Nbp_to_N(Nbp, a, b, l)
-                if N < N_lim3:
-                    # Ogston-Zimm
-                    L = contour_length(Nbp, b)   # (m)
-                    Rg = radius_gyration(L, lp)  # (m)
-                    D0 = free_solution(kB, temperature, eta, Rg)  # (m^2/s)
-                    DRouse = Ogston_Rouse(Nbp, kB, temperature,
-                                          a, eta, b, l)  # (m^2/s)
-                    g = Zimm_g(Nbp, DRouse, qeff, mu0, kB, temperature)# to base
-                    D = Ogston_Zimm(D0, g)                             # units??
-                elif N < N_lim2:
-                    # Rouse/Reptation-equilibrium
-                    D = Db/N**2
-                elif N > N_lim1:
-                    # Reptation-plateau (reptation with orientation)
-                    D = Db*epsilon**(3/2)
-                else:
-                    # Accelerated-reptation
-                    D = Db*epsilon*N**(-1/2)
-                frag_width = bandbroadening(D, time).to('cm')
-                lane_widths.append(frag_width)
-            self.bandwidthsI.append(lane_widths)
-        bandwidthsI = self.bandwidthsI
-
-        # Total bandwidths
-        bandwidths = [[bandwidths0[i][j] + bandwidthsI[i][j] for j in xrange(len(lanes[i]))]
-                      for i in xrange(nlanes)]
-        self.bandwidths = bandwidths
-        if bandwidth == 0: bandwidths = self.bandwidths0
-        if bandwidth == 1: bandwidths = self.bandwidthsI
-        
-        # Max intensities
-        raw_Is = []
-        maxI = Q_(-np.inf, 'ng/cm')
-        minI = Q_(np.inf, 'ng/cm')
-        for i, lane in enumerate(lanes):
-            lane_I = []
-            for j in xrange(len(lane)):
-                frag_Qty = quantities[i][j]
-                frag_Wth = bandwidths[i][j]  # w=FWHM or w=FWTM ???
-                if FWTM:
-                    FWHM = Gauss_FWHM(frag_Wth)
-                else:
-                    FWHM = frag_Wth
-                std_dev = Gauss_dev(FWHM)
-                auc = frag_Qty  # area under curve proportional to DNA quantity
-                frag_I = Gauss_hgt(auc, std_dev)  # peak height
-                if frag_I > maxI:
-                    maxI = frag_I
-                if frag_I < minI:
-                    minI = frag_I
-                lane_I.append(frag_I)
-            raw_Is.append(lane_I)
-
-        # max intensity normalization
-        satI = maxI+exposure*(minI-maxI)
-        intensities = [[(1-back_col)/satI*fragI for fragI in lane]
-                       for lane in raw_Is]
-        self.intensities = intensities
+        self._sample_data()
+        self._run_inputs = self._inputs()
+
+        # Stages
+        data_args = (dataset, mu_func, interpol, replNANs)
+        data_key = (dset_name, id(dataset), interpol, replNANs)
+        mobilities = self._stage('mobilities', data_key,
+                                 self._mobilities_stage, *data_args)
+        fit = self._stage('fit', data_key, self._fit_stage, *data_args)
+        mu0 = self._stage('mu0', data_key, self._mu0_stage, *data_args)
+        diffusion = self._stage('diffusion', (geometry, till_len, till_time),
+                                self._diffusion_stage, mobilities, fit, mu0,
+                                geometry, till_len, till_time)
+        self._stage('intensities', (exposure, back_col, bandwidth, FWTM),
+                    self._intensities_stage, diffusion, exposure, back_col,
+                    bandwidth, FWTM)
+        plot_bandwidths = [self.bandwidths0, self.bandwidthsI,
+                           self.bandwidths][bandwidth]
+        self.raster_opts = dict(res=res, back_col=back_col, noise=noise,
+                                Itol=Itol, FWTM=FWTM, bandwidth=bandwidth,
+                                lateral_dev=lateral_dev)
 
         # Plot gel
         if plot:
             # Title
-            mins, secs = divmod(time.to('s').magnitude, 60)  # time is in secs
+            time = diffusion[0]
+            mins, secs = divmod(time, 60)  # time is in secs
             hours, mins = divmod(mins, 60)
-            hours = Q_(hours, 'hr')
-            mins = Q_(mins, 'min')
-            secs = Q_(secs, 's')
             title = ('E = %.2f V/cm\n'
                      'C = %.1f %%\n'
                      'T = %.2f K\n'
                      't = %d h %02d m\n'
-                     'expo = %.1f' %(field.to('V/cm').magnitude,
-                                     percentage.magnitude,
-                                     temperature.magnitude,
-                                     hours.magnitude, mins.magnitude,
+                     'expo = %.1f' %(self.field.to('V/cm').magnitude,
+                                     self.percent.magnitude,
+                                     self.temperature.to('K').magnitude,
+                                     hours, mins,
                                      exposure))
             # Plot
-            gelpic = gelplot_imshow(distances, bandwidths, intensities, lanes,
-                                    names, gel_len, wellx, welly, wellsep, res,
-                                    cursor_ovr, back_col, band_col, well_col,
-                                    noise, Itol, title, FWTM, False)
+            nlanes = len(lanes)
+            gelpic = gelplot_imshow(self.distances, plot_bandwidths,
+                                    self.intensities, lanes, names,
+                                    self.gel_len.to('cm'),
+                                    Q_(lane_values(self.wellx, 'cm', nlanes),
+                                       'cm'),
+                                    Q_(lane_values(self.welly, 'cm', nlanes),
+                                       'cm'),
+                                    self.wellsep.to('cm'), res, cursor_ovr,
+                                    back_col, band_col, well_col, noise, Itol,
+                                    title, FWTM, False, lateral_dev)
             return gelpic
         return None
 
 
+    def _assert_run(self):
+        '''Asserts that the results of the last run are up to date.'''
+        assert self.raster_opts is not None, "Gel must be run first."
+        assert (all(name in self._stages for name in self.run_stages) and
+                self._samples_key() == self._samples and
+                self._run_inputs == self._inputs()), (
+            "Gel must be re-run after changing its conditions or samples.")
+
+    def _raster_args(self, res=None, back_col=None, noise=None,
+                     lateral_dev=None):
+        '''
+        Unit-free arguments of <render_gel> (and <render_gel_tiles>) for the
+        last run, with <res>, <back_col>, <noise> and <lateral_dev>
+        defaulting to those of that run. The intensities are rescaled to
+        <back_col> (see <intensity_scale>).
+        '''
+        self._assert_run()
+        opts = self.raster_opts
+        res = to_units(res if res is not None else opts['res'], 'px/cm',
+                       'res').magnitude
+        back_col = back_col if back_col is not None else opts['back_col']
+        scale = intensity_scale(back_col, opts['back_col'])
+        noise = noise if noise is not None else opts['noise']
+        if lateral_dev is None:
+            lateral_dev = opts['lateral_dev']
+        if lateral_dev is not None:
+            lateral_dev = to_units(lateral_dev, 'cm', 'lateral_dev').magnitude
+        bandwidths = [self.bandwidths0, self.bandwidthsI,
+                      self.bandwidths][opts['bandwidth']]
+        nlanes = len(self.samples)
+        return dict(lateral_dev=lateral_dev,
+                    distances=[d.to('cm').magnitude for d in self.distances],
+                    bandwidths=[w.to('cm').magnitude for w in bandwidths],
+                    intensities=[scale*I.magnitude for I in self.intensities],
+                    gel_len=self.gel_len.to('cm').magnitude,
+                    wellx=lane_values(self.wellx, 'cm', nlanes),
+                    wellsep=self.wellsep.to('cm').magnitude,
+                    res=res, back_col=back_col, noise=noise,
+                    Itol=opts['Itol'], FWTM=opts['FWTM'])
+
+    def render(self, res=None, back_col=None, noise=None, dtype=np.float32,
+               lateral_dev=None):
+        '''
+        Returns the image of the gel from its last run as a grayscale array
+        (pxl_y, pxl_x) with values in [0, 1], or quantized to <dtype>
+        (np.uint8, np.uint16), plus a dictionary with
+        the image extent (cm), the resolution (px/cm), the lane centers
+        (cm) and column spans (px), and the boxes [x, y, width, height]
+        (cm) and sizes (bp) of the bands of every lane.
+        No plotting is involved. <res>, <back_col>, <noise> and
+        <lateral_dev> default to those of the last run.
+        '''
+        args = self._raster_args(res, back_col, noise, lateral_dev)
+        image, centers, col_spans = render_gel(dtype=dtype, **args)
+        nlanes = len(self.samples)
+        distances = args['distances']
+        bandwidths = args['bandwidths']
+        wellx = args['wellx']
+        band_boxes = [np.column_stack((np.repeat(centers[i] - wellx[i]/2.0,
+                                                 len(distances[i])),
+                                       distances[i] - bandwidths[i]/2.0,
+                                       np.repeat(wellx[i], len(distances[i])),
+                                       bandwidths[i]))
+                      for i in xrange(nlanes)]
+        info = dict(extent=(0, wellx.sum() + (nlanes+1)*args['wellsep'],
+                            args['gel_len'], 0),
+                    res=args['res'],
+                    centers=centers,
+                    col_spans=col_spans,
+                    band_boxes=band_boxes,
+                    band_sizes=[sample.sizes for sample in self.samples])
+        return image, info
+
+    def save_image(self, fname, res=None, back_col=None, noise=None,
+                   bits=8, tile_rows=512, lateral_dev=None):
+        '''
+        Saves the image of the gel from its last run to <fname> (.png or
+        .tif/.tiff) as a <bits> (8 or 16) bit grayscale image. The image is
+        rendered and written in horizontal strips of <tile_rows> pixel rows
+        (see <render_gel_tiles>), so very high resolutions (<res>) can be
+        saved with bounded memory. <res>, <back_col>, <noise> and
+        <lateral_dev> default to those of the last run.
+        '''
+        dtype = {8: np.uint8, 16: np.uint16}[bits]
+        args = self._raster_args(res, back_col, noise, lateral_dev)
+        pxl_x, pxl_y = gel_geometry(args['gel_len'], args['wellx'],
+                                    args['wellsep'], args['res'])[:2]
+        tiles = render_gel_tiles(dtype=dtype, tile_rows=tile_rows, **args)
+        ext = fname.rsplit('.', 1)[-1].lower()
+        if ext == 'png':
+            write_png(fname, tiles, pxl_x, pxl_y, args['res'])
+        elif ext in ('tif', 'tiff'):
+            write_tiff(fname, tiles, pxl_x, pxl_y, args['res'])
+        else:
+            raise ValueError("Unsupported image format: %r" %ext)
+
+    def timelapse_times(self, times=None, frames=50):
+        '''
+        Times (s) of <timelapse>: <times> (hours by default) or, if not
+        given, <frames> equally spaced times up to the runtime of the last
+        run.
+        '''
+        self._assert_run()
+        if times is None:
+            time = self._stages['diffusion'][1][0]
+            return np.linspace(time/frames, time, frames)  # s
+        times = to_units(times, 'hr', 'times').to('s').magnitude
+        return np.atleast_1d(times)
+
+    def timelapse(self, times=None, frames=50):
+        '''
+        Generator of the bands of the last run at each of the times of
+        <timelapse_times>. Yields (time, distances, bandwidths, intensities)
+        with the fragments of all the lanes in single arrays (time in s,
+        lengths in cm; lane i: bounds[i]:bounds[i+1], see
+        <_fragment_arrays>).
+        The mobilities and diffusion coefficients of the run are reused:
+        the distances grow linearly with time and the diffusional
+        bandwidths as sqrt(2*D*t). The intensities keep the normalization
+        of the run, so the bands fade as they broaden.
+        '''
+        times = self.timelapse_times(times, frames)
+        mobilities = self._stages['mobilities'][1]                # m^2/(V.s)
+        time, bandwidths0, bandwidthsI, D = self._stages['diffusion'][1]
+        norm = self._stages['intensities'][1][1]
+        quantities = self._fragment_arrays()[1]
+        bandwidth = self.raster_opts['bandwidth']
+        FWTM = self.raster_opts['FWTM']
+        field = self.field.to('V/m').magnitude
+        for t in times:
+            bandwidthsI = bandbroadening(D, t)  # m
+            bandwidths = [bandwidths0, bandwidthsI,
+                          bandwidths0 + bandwidthsI][bandwidth]
+            FWHM = Gauss_FWHM(bandwidths) if FWTM else bandwidths
+            intensities = norm*Gauss_hgt(quantities, Gauss_dev(FWHM))
+            yield (t, rundistance(t, mobilities, field)*100, bandwidths*100,
+                   intensities)
+
+    def timelapse_frames(self, times=None, frames=50, res=None,
+                         back_col=None, noise=None, dtype=np.float32,
+                         lateral_dev=None):
+        '''
+        Generator of the images of the gel (see <render>) at each time of
+        <timelapse>, one frame at a time, e.g. for <write_video> (see also
+        <save_timelapse>).
+        '''
+        args = self._raster_args(res, back_col, noise, lateral_dev)
+        scale = intensity_scale(args['back_col'],
+                                self.raster_opts['back_col'])
+        bounds = self._fragment_arrays()[2]
+        split = lambda values: [values[bounds[i]:bounds[i+1]]
+                                for i in xrange(len(self.samples))]
+        for t, distances, bandwidths, intensities in self.timelapse(times,
+                                                                    frames):
+            args.update(distances=split(distances),
+                        bandwidths=split(bandwidths),
+                        intensities=split(scale*intensities))
+            yield render_gel(dtype=dtype, **args)[0]
+
+    def save_timelapse(self, fname, times=None, frames=50, res=None,
+                       back_col=None, noise=None, lateral_dev=None, fps=10,
+                       writer='ffmpeg'):
+        '''
+        Streams the frames of <timelapse_frames> to <fname>: a .npz archive
+        (see <write_npz>) with the frame times (s) as 'times' and the images
+        as 'frame0000', 'frame0001', ..., or else a video (see
+        <write_video>, <fps> and <writer>).
+        '''
+        images = self.timelapse_frames(times, frames, res, back_col, noise,
+                                       np.float32, lateral_dev)
+        if fname.lower().endswith('.npz'):
+            times = self.timelapse_times(times, frames)
+            write_npz(fname, chain([('times', times)],
+                                   (('frame%04d' %i, image)
+                                    for i, image in enumerate(images))))
+        else:
+            write_video(fname, images, fps, writer)
+
+    def kymograph(self, lane, times=None, frames=50, res=None):
+        '''
+        Kymograph of <lane> (index) over the times of <timelapse>: array
+        (times, pxl_y) whose rows are the intensity profiles along the lane
+        (without background) at each time. Returns it with the times (s).
+        '''
+        args = self._raster_args(res)
+        pxl_y = gel_geometry(args['gel_len'], args['wellx'], args['wellsep'],
+                             args['res'])[1]
+        bounds = self._fragment_arrays()[2]
+        lane = slice(bounds[lane], bounds[lane+1])
+        profiles, frame_times = [], []
+        for t, distances, bandwidths, intensities in self.timelapse(times,
+                                                                    frames):
+            frame_times.append(t)
+            profiles.append(lane_profiles([distances[lane]],
+                                          [bandwidths[lane]],
+                                          [intensities[lane]], pxl_y,
+                                          args['res'], args['Itol'],
+                                          args['FWTM'])[0])
+        return np.array(profiles, dtype=np.float32), np.array(frame_times)
+
+
+class GelMosaic(Gel):
+    '''
+    Mosaic of gels: the same samples run under different conditions.
+    <conditions> is a grid (list of rows) of dicts with any of the keys
+    'electrfield', 'percentgel' and 'temperature'; missing keys and the
+    rest of the arguments of <Gel> are shared by all the panels.
+    The sample-dependent data (volumes, quantities and fragment arrays) is
+    computed once, and only the condition-dependent part of <Gel.run> is
+    repeated for each panel.
+    '''
+
+    setters = dict(electrfield='set_field',
+                   percentgel='set_percentgel',
+                   temperature='set_temperature')
+
+    def __init__(self, samples, names=None, conditions=[[{}]], **gel_kwds):
+        Gel.__init__(self, samples, names, **gel_kwds)
+        assert len(set(len(row) for row in conditions)) == 1, \
+               "<conditions> must be a rectangular grid (list of rows)."
+        self.conditions = conditions
+        self.defaults = dict(electrfield=self.field,
+                             percentgel=self.percent,
+                             temperature=self.temperature)
+        self.panels = []
+
+    def set_condition(self, condition):
+        '''Sets the conditions of a panel (see <GelMosaic>).'''
+        values = dict(self.defaults)
+        values.update(condition)
+        for key, value in values.items():
+            getattr(self, self.setters[key])(value)
+
+    def run(self, plot=True, spacing=Q_(15,'mm'), sep_col=1, **run_kwds):
+        '''
+        Runs every panel with the same <run_kwds> (see <Gel.run>) and keeps
+        its conditions, runtime and raster arguments in <panels> (same grid
+        as <conditions>). Returns the plot of the mosaic if <plot>.
+        The default conditions (<defaults>) are restored afterwards, so
+        that the gel is not left at the conditions of the last panel.
+        '''
+        self.panels = []
+        try:
+            for row in self.conditions:
+                panels = []
+                for condition in row:
+                    self.set_condition(condition)
+                    Gel.run(self, plot=False, **run_kwds)
+                    panels.append(dict(field=self.field,
+                                       percent=self.percent,
+                                       temperature=self.temperature,
+                                       runtime=self.runtime,
+                                       raster_args=self._raster_args()))
+                self.panels.append(panels)
+        finally:
+            self.set_condition({})
+        if plot:
+            return self.plot(spacing, sep_col)
+        return None
+
+    def render(self, res=None, back_col=None, noise=None, dtype=np.float32,
+               lateral_dev=None, spacing=Q_(15,'mm'), sep_col=1):
+        '''
+        Renders all the panels of the last run into a single grayscale
+        image (see <Gel.render>), with <spacing> between panels filled with
+        <sep_col> (or the background, if None). The background and noise
+        are added to the whole image in a single pass.
+        Returns the image and a dictionary with its extent (cm), the
+        resolution (px/cm), the origins [x, y] (cm) of the panels and the
+        lane centers (cm) and column spans (px) within a panel.
+        '''
+        assert self.panels, "GelMosaic must be run before render."
+        args = self.panels[0][0]['raster_args']
+        res = (to_units(res, 'px/cm', 'res').magnitude if res is not None
+               else args['res'])
+        back_col = back_col if back_col is not None else args['back_col']
+        noise = noise if noise is not None else args['noise']
+        if lateral_dev is not None:
+            lateral_dev = to_units(lateral_dev, 'cm', 'lateral_dev').magnitude
+        else:
+            lateral_dev = args['lateral_dev']
+        pxl_x, pxl_y, centers, col_spans = gel_geometry(args['gel_len'],
+                                                        args['wellx'],
+                                                        args['wellsep'], res)
+        gap = int(round(to_units(spacing, 'cm', 'spacing').magnitude * res))
+        nrows, ncols = len(self.panels), len(self.panels[0])
+        image = np.zeros(shape=(nrows*(pxl_y+gap)-gap, ncols*(pxl_x+gap)-gap),
+                         dtype=np.float32)
+        origins = []
+        for i, row in enumerate(self.panels):
+            origins.append([])
+            for j, panel in enumerate(row):
+                y0, x0 = i*(pxl_y+gap), j*(pxl_x+gap)
+                origins[i].append((x0/res, y0/res))
+                args = panel['raster_args']
+                scale = intensity_scale(back_col, args['back_col'])
+                view = image[y0:y0+pxl_y, x0:x0+pxl_x]
+                rasterize_bands(view, args['distances'], args['bandwidths'],
+                                [scale*I for I in args['intensities']],
+                                col_spans, res, args['Itol'], args['FWTM'])
+                if lateral_dev:
+                    convolve_lateral(view, lateral_dev * res)
+        add_background(image, back_col, noise)
+        if sep_col is not None and gap > 0:
+            for i in xrange(1, nrows):
+                image[i*(pxl_y+gap)-gap:i*(pxl_y+gap)] = sep_col
+            for j in xrange(1, ncols):
+                image[:, j*(pxl_x+gap)-gap:j*(pxl_x+gap)] = sep_col
+        np.clip(image, 0, 1, out=image)
+        info = dict(extent=(0, image.shape[1]/res, image.shape[0]/res, 0),
+                    res=res,
+                    origins=origins,
+                    centers=centers,
+                    col_spans=col_spans)
+        return quantize_image(image, dtype), info
+
+    def plot(self, spacing=Q_(15,'mm'), sep_col=1):
+        '''Plots the mosaic of the last run (see <render>).'''
+        from matplotlib import pyplot as plt, cm
+        image, info = self.render(spacing=spacing, sep_col=sep_col)
+        width, height = info['extent'][1:3]
+        fig = plt.figure()
+        ax1 = fig.add_subplot(111)
+        ax1.imshow(image, extent=info['extent'], interpolation='none',
+                   cmap=cm.gray, vmin=0, vmax=1)
+        ticks = []
+        for i, row in enumerate(self.panels):
+            for j, panel in enumerate(row):
+                x0, y0 = info['origins'][i][j]
+                mins, secs = divmod(panel['runtime'].to('s').magnitude, 60)
+                hours, mins = divmod(mins, 60)
+                title = ('%.2f V/cm\n%.1f %%\n%.1f K\n%d h %02d m'
+                         %(panel['field'].to('V/cm').magnitude,
+                           panel['percent'].magnitude,
+                           panel['temperature'].to('K').magnitude,
+                           hours, mins))
+                ax1.text(x0, y0, title, va='bottom', fontsize=5)
+                if i == len(self.panels)-1:
+                    ticks.extend(x0 + info['centers'])
+        ax1.set_xticks(ticks)
+        ax1.set_xticklabels(self.names*len(self.panels[-1]),
+                            fontsize='x-small')
+        ax1.set_yticks([])
+        ax1.set_xlim(0, width)
+        ax1.set_ylim(height, -2*to_units(spacing, 'cm', 'spacing').magnitude)
+        plt.gca().set_aspect('equal', adjustable='box')
+        return plt
+
+    def save_image(self, fname, res=None, back_col=None, noise=None,
+                   bits=8, lateral_dev=None, spacing=Q_(15,'mm'), sep_col=1):
+        '''
+        Saves the mosaic of the last run to <fname> (.png or .tif/.tiff) as
+        a <bits> (8 or 16) bit grayscale image (see <render>).
+        '''
+        dtype = {8: np.uint8, 16: np.uint16}[bits]
+        image, info = self.render(res, back_col, noise, dtype, lateral_dev,
+                                  spacing, sep_col)
+        pxl_y, pxl_x = image.shape
+        ext = fname.rsplit('.', 1)[-1].lower()
+        if ext == 'png':
+            write_png(fname, [image], pxl_x, pxl_y, info['res'])
+        elif ext in ('tif', 'tiff'):
+            write_tiff(fname, [image], pxl_x, pxl_y, info['res'])
+        else:
+            raise ValueError("Unsupported image format: %r" %ext)
+
+
+# Fragment (per lane) and condition results of a sweep, with their units
+sweep_units = OrderedDict([('mobilities', 'cm**2/V/s'),
+                           ('distances', 'cm'),
+                           ('bandwidths0', 'cm'),
+                           ('bandwidthsI', 'cm'),
+                           ('bandwidths', 'cm'),
+                           ('intensities', 'dimensionless'),
+                           ('runtime', 's'),
+                           ('freesol_mob', 'cm**2/V/s'),
+                           ('vWBR_muS', 'cm**2/V/s'),
+                           ('vWBR_muL', 'cm**2/V/s'),
+                           ('vWBR_gamma', 'bp'),
+                           ('poresize', 'nm'),
+                           ('accel_to_plateau', 'bp'),
+                           ('equil_to_accel', 'bp'),
+                           ('Zimm_to_Rouse', 'bp')])
+
+_sweep_state = {}  # gel and run options of the sweep in progress
+
+
+def _sweep_init(samples, names, gel_kwds, run_kwds):
+    '''
+    Sets up the gel and run options of a sweep (see <gel_sweep>) in the
+    current process (the initializer of its worker processes).
+    '''
+    dataset_interpolators(get_dataset(run_kwds.get('dset_name')))
+    _sweep_state.update(gel=Gel(samples, names, **gel_kwds),
+                        run_kwds=run_kwds)
+
+
+def _sweep_run(condition):
+    '''
+    Runs the gel of the sweep in progress (see <gel_sweep>) under
+    <condition>, a (field, percentage, temperature) tuple in V/cm, % and K,
+    and returns the unit-free results named in <sweep_units>.
+    '''
+    field, percentage, temperature = condition
+    G = _sweep_state['gel']
+    G.set_field(Q_(field, 'V/cm'))
+    G.set_percentgel(Q_(percentage, '(g/(100 mL))*100'))
+    G.set_temperature(Q_(temperature, 'K'))
+    G.run(**_sweep_state['run_kwds'])
+    results = {}
+    for attr, units in sweep_units.items():
+        value = getattr(G, attr)
+        if isinstance(value, list):
+            value = np.concatenate([v.to(units).magnitude for v in value])
+        else:
+            value = value.to(units).magnitude
+        results[attr] = value
+    return results
+
+
+def gel_sweep(samples, fields, percentages, temperatures=Q_(295.15,'K'),
+              names=None, processes=None, gel_kwds=None, **run_kwds):
+    '''
+    Runs a gel loaded with <samples> under every combination of <fields>,
+    <percentages> and <temperatures>, spread over <processes> worker
+    processes (one per CPU by default, 1 to run serially).
+    <gel_kwds> are passed to <Gel> (geometry) and <run_kwds> to <Gel.run>
+    (no plotting is done).
+    The gel and run options reach the workers through the pool initializer
+    (see <_sweep_init>), so that any start method works. The dataset
+    interpolators are built before the workers are started, but they (and
+    the datasets registered at run time) are only shared if the workers
+    are forked. The conditions are handed out in chunks of equal field
+    and percentage, so that every worker reuses its cached vWBR fits and
+    free solution mobilities.
+    Returns a dict with the condition axes ('fields', 'percentages',
+    'temperatures'), the lane <bounds> of the fragments (lane i:
+    bounds[i]:bounds[i+1]) and the results named in <sweep_units>, as arrays
+    indexed [field, percentage, temperature] (and [fragment] for the
+    per-lane results).
+    '''
+    fields = np.atleast_1d(to_units(fields, 'V/cm', 'fields').magnitude)
+    percentages = np.atleast_1d(to_units(percentages, '(g/(100 mL))*100',
+                                         'percentages').magnitude)
+    temperatures = np.atleast_1d(to_units(temperatures, 'K',
+                                          'temperatures').magnitude)
+    shape = (len(fields), len(percentages), len(temperatures))
+    conditions = [(E, T, K) for E in fields for T in percentages
+                  for K in temperatures]  # temperature varies fastest
+    run_kwds['plot'] = False
+    dataset_interpolators(get_dataset(run_kwds.get('dset_name')))
+    init_args = (samples, names, gel_kwds or {}, run_kwds)
+    if processes == 1:
+        _sweep_init(*init_args)
+        try:
+            results = map(_sweep_run, conditions)
+        finally:
+            _sweep_state.clear()
+    else:
+        workers = Pool(processes, _sweep_init, init_args)
+        try:
+            results = workers.map(_sweep_run, conditions, len(temperatures))
+        finally:
+            workers.close()
+            workers.join()
+    sweep = dict(fields=Q_(fields, 'V/cm'),
+                 percentages=Q_(percentages, '(g/(100 mL))*100'),
+                 temperatures=Q_(temperatures, 'K'),
+                 bounds=np.cumsum([0] + [len(sample.solutes)
+                                         for sample in samples]))
+    for attr, units in sweep_units.items():
+        values = np.array([result[attr] for result in results])
+        sweep[attr] = Q_(values.reshape(shape + values.shape[1:]), units)
+    return sweep
+
 
 if __name__=="__main__":
     from random import randint
 
     test_gel = True
+    test_timelapse = True
     test_mu0 = True
     test_vWBRfit = True
     test_vWBRfit_comprehensive = False  # very time consuming
+    test_sweep = False  # time consuming
     test_samples = True
     check_ladders = True
     test_gen_ladder = True
@@ -1504,8 +3327,8 @@ if __name__=="__main__":
 
     # Samples
     ladder = ladder_from_info('1kb_GeneRuler')
-    sample1 = Sample(randDNAseqs([561, 1302, 135, 5021]))
-    sample2 = Sample(randDNAseqs([3000, 500, 1500]))
+    sample1 = Sample(fragments([561, 1302, 135, 5021]))
+    sample2 = Sample(fragments([3000, 500, 1500]))
     samples = [ladder, sample1, sample2]
 
     # Volumes and Quantities
@@ -1550,6 +3373,39 @@ if __name__=="__main__":
             pic.show()
 
 
+    if test_timelapse:
+        ### Test <Gel.save_timelapse> ### -------------------------------------
+        print '\n'+80*'#'
+        print '( Time-lapse )'.center(80, '#')
+        print 80*'#'+'\n'
+        import os, tempfile
+        from matplotlib import animation
+        G = Gel(samples, lanenames, percentgel, electrfield, temperature,
+                gel_len, wellx, welly, wellz, wellsep)
+        G.run(till_len, till_time, exposure, geometry, False, Q_(50, 'px/in'),
+              cursor_ovr, back_col, band_col, well_col, noise, interpol,
+              dset_name, replNANs)
+        tmpdir = tempfile.mkdtemp()
+        fname = os.path.join(tmpdir, 'timelapse.npz')
+        G.save_timelapse(fname, frames=3)
+        archive = np.load(fname)
+        assert sorted(archive.files) == ['frame0000', 'frame0001',
+                                         'frame0002', 'times']
+        assert archive['frame0002'].shape == G.render()[0].shape
+        print 'times (h):', (archive['times']/3600).round(2)
+        if animation.writers.is_available('ffmpeg'):
+            fname = os.path.join(tmpdir, 'timelapse.mp4')
+            G.save_timelapse(fname, frames=3)
+            print 'video:', fname, os.path.getsize(fname), 'bytes'
+        else:
+            print 'ffmpeg is not available: video not written'
+        G.set_field(2*G.field)
+        try:
+            G.timelapse_frames(frames=3).next()
+        except AssertionError as error:
+            print 'changed conditions:', error
+
+
     if test_mu0:
         ### Test <ferguson_to_mu0> ### ----------------------------------------
         print '\n'+80*'#'
@@ -1590,14 +3446,31 @@ if __name__=="__main__":
                                  method=interpol, replNANs=replNANs, plot=plot)
 
 
+    if test_sweep:
+        ### Test <gel_sweep> ### ----------------------------------------------
+        print '\n'+80*'#'
+        print '( Parameter Sweep )'.center(80, '#')
+        print 80*'#'+'\n'
+        sweep = gel_sweep(samples, E_space, T_space, temperature, lanenames,
+                          gel_kwds=dict(gel_len=gel_len, wellx=wellx,
+                                        welly=welly, wellz=wellz,
+                                        wellsep=wellsep),
+                          till_len=till_len, till_time=till_time,
+                          exposure=exposure, geometry=geometry,
+                          interpol=interpol, dset_name=dset_name,
+                          replNANs=replNANs)
+        print 'runtime (h):'
+        print sweep['runtime'].to('hr').magnitude[:, :, 0].round(2)
+
+
     if test_samples:
         ## Test Sample class ### ----------------------------------------------
         print '\n'+80*'#'
         print '( Sample Class Demonstration )'.center(80, '#')
         print 80*'#'+'\n'
-        dseqs1 = randDNAseqs([500, 1000, 5000])
+        dseqs1 = randDNAseqs([500, 1000, 5000], seed=1)
         qts1 = lindivQ(dseqs1, 200)
-        dseqs2 = randDNAseqs([3000, 1500])
+        dseqs2 = randDNAseqs([3000, 1500], seed=2)
         qts2 = lindivQ(dseqs2, 150)
         s1 = Sample(dseqs1, qts1, 20)
         s2 = Sample(['dna1','dna2','dna3'], qts1, 20)